@@ -0,0 +1,186 @@
+"""
+ZvideoAssistant离线压测：合成极影视数据库 + 本地豆瓣/TMDB替身，
+逐个测量插件公开操作的吞吐、HTTP调用数、SQL语句数及峰值内存
+
+需在MoviePilot环境中运行（可导入app包）：
+
+    python benchmarks/zvideoassistant/bench.py --rows 100000 --latency 0.005 --error-rate 0.01
+"""
+import argparse
+import importlib
+import json
+import multiprocessing
+import resource
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from stub_server import StubAdapter, StubServer, StubTmdbApi  # noqa: E402
+from synthetic import generate, generate_imdb, generate_score_file  # noqa: E402
+
+PLUGINS_DIR = Path(__file__).resolve().parents[2] / "plugins"
+
+OPERATIONS = {
+    # 操作名: (插件方法, 需要的配置)
+    "do_job": ("do_job", dict(sync_douban_status=True, use_douban_score=True, use_tmdb_score=True)),
+    "do_job_unchanged": ("do_job", dict(sync_douban_status=True, use_douban_score=True, use_tmdb_score=True)),
+    "use_douban_score": ("use_douban_score", dict(use_douban_score=True)),
+    "use_tmdb_score": ("use_tmdb_score", dict(use_tmdb_score=True)),
+    "sync_douban_status": ("sync_douban_status", dict(sync_douban_status=True)),
+    "use_imdb_score": ("use_imdb_score", dict(use_imdb_score=True)),
+    "import_scores": ("import_scores", dict(use_douban_score=True, use_tmdb_score=True)),
+    "refresh_stale_scores": ("refresh_stale_scores", dict(use_douban_score=True, use_tmdb_score=True,
+                                                          refresh_stale_score=True, refresh_limit=1000)),
+}
+
+
+class SqlCounter:
+    """
+    包装sqlite3.connect，统计插件执行的SQL语句数
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._connect = sqlite3.connect
+
+    def install(self):
+        def connect(*args, **kwargs):
+            conn = self._connect(*args, **kwargs)
+            conn.set_trace_callback(self._trace)
+            return conn
+
+        sqlite3.connect = connect
+
+    def _trace(self, statement: str):
+        if not statement.startswith("PRAGMA"):
+            self.count += 1
+
+
+def load_plugin(db_path: Path, data_dir: Path, base_url: str, options: dict):
+    import app.plugins
+    if str(PLUGINS_DIR) not in app.plugins.__path__:
+        app.plugins.__path__.append(str(PLUGINS_DIR))
+    module = importlib.import_module("app.plugins.zvideoassistant")
+    plugin = module.ZvideoAssistant()
+    # 插件数据保存在内存及临时目录中，不写入MoviePilot数据库
+    plugin_data = {}
+    plugin.get_data = lambda key=None, plugin_id=None: plugin_data.get(key)
+    plugin.save_data = lambda key, value, plugin_id=None: plugin_data.__setitem__(key, value)
+    plugin.del_data = lambda key, plugin_id=None: plugin_data.pop(key, None)
+    plugin.get_data_path = lambda plugin_id=None: data_dir
+    plugin.update_config = lambda config, plugin_id=None: True
+    plugin.init_plugin(dict(enabled=True, db_path=str(db_path), apikey="bench",
+                            cookie='dbcl2="12345:abc"; bid=bench', cron="0 0 * * *", **options))
+    adapter = StubAdapter(base_url)
+    for client in (plugin._douban_client, plugin._douban_web_client, plugin._tmdb_client):
+        client.session.mount("https://", adapter)
+        client.session.mount("http://", adapter)
+        # 去掉限速间隔及退避等待，只测量插件自身及替身延迟
+        client.min_interval = client._interval = 0
+        client.interval_step = 1
+        client.backoff_base = 0.01
+    plugin.tmdb = plugin._providers["tmdb"].tmdb = StubTmdbApi(base_url)
+    # 压测不发送通知
+    plugin._notify = False
+    return plugin
+
+
+def run_operation(name: str, db_path: Path, data_dir: Path, base_url: str,
+                  queue: multiprocessing.Queue, ready: multiprocessing.Event):
+    """
+    子进程中执行单个操作，保证峰值内存互不影响
+    """
+    method, options = OPERATIONS[name]
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute("SELECT COUNT(*) FROM zvideo_collection").fetchone()[0]
+    if name == "use_imdb_score":
+        # IMDb数据集与数据库的影片对应，测量包含首次导入数据集
+        options = dict(options, imdb_path=str(generate_imdb(data_dir / "imdb-dataset", rows=rows)))
+    counter = SqlCounter()
+    counter.install()
+    plugin = load_plugin(db_path, data_dir, base_url, options)
+    # 操作方法的参数
+    kwargs = {}
+    if name == "do_job_unchanged":
+        # 先运行至记录的数据库状态不再变化（插件自身的写入会使下次运行再执行一次），再测量数据库无变化时的运行
+        for _ in range(5):
+            getattr(plugin, method)()
+            if plugin._scan_state.get("fingerprint") == plugin._ZvideoAssistant__db_fingerprint():
+                break
+    elif name == "refresh_stale_scores":
+        # 先记录各评分的获取时间，再整体提前一年，使全部评分均已过期
+        getattr(plugin, method)()
+        with sqlite3.connect(plugin._store.db_path) as conn:
+            conn.execute("UPDATE score_refresh SET refreshed_at = refreshed_at - 365 * 24 * 60 * 60")
+    elif name == "import_scores":
+        kwargs["path"] = str(generate_score_file(data_dir / "scores.csv", db_path))
+    # 通知主进程清零替身的调用计数
+    queue.put(None)
+    ready.wait()
+    counter.count = 0
+    started = time.perf_counter()
+    getattr(plugin, method)(**kwargs)
+    elapsed = time.perf_counter() - started
+    queue.put(dict(
+        operation=name,
+        rows=rows,
+        seconds=round(elapsed, 3),
+        rows_per_second=round(rows / elapsed, 1) if elapsed else None,
+        sql_statements=counter.count,
+        peak_rss_mb=round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ZvideoAssistant离线压测")
+    parser.add_argument("--rows", type=int, default=10000, help="zvideo_collection行数，最多100000")
+    parser.add_argument("--latency", type=float, default=0.0, help="替身接口的响应延迟（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="替身接口返回429/503的比例")
+    parser.add_argument("--operations", nargs="*", default=list(OPERATIONS), choices=list(OPERATIONS))
+    parser.add_argument("--output", help="结果另存为JSON文件")
+    args = parser.parse_args()
+    if not 0 < args.rows <= 100000:
+        parser.error("--rows 需在1到100000之间")
+
+    workdir = Path(tempfile.mkdtemp(prefix="zvideo-bench-"))
+    template = generate(workdir / "template.db", rows=args.rows)
+    server = StubServer(latency=args.latency, error_rate=args.error_rate).start()
+    context = multiprocessing.get_context("fork")
+    results = []
+    try:
+        for name in args.operations:
+            # 每个操作使用全新的数据库副本及插件数据目录
+            db_path = workdir / f"{name}.db"
+            shutil.copyfile(template, db_path)
+            data_dir = workdir / f"{name}-data"
+            data_dir.mkdir()
+            queue = context.Queue()
+            ready = context.Event()
+            process = context.Process(target=run_operation,
+                                      args=(name, db_path, data_dir, server.base_url, queue, ready))
+            process.start()
+            queue.get()
+            server.reset()
+            ready.set()
+            result = queue.get()
+            process.join()
+            result["http_calls"] = dict(server.calls)
+            result["http_total"] = sum(result["http_calls"].values())
+            results.append(result)
+            print(f"{name:20} {result['seconds']:>8.2f}s {result['rows_per_second'] or 0:>10.0f} rows/s "
+                  f"http={result['http_total']:<6} sql={result['sql_statements']:<6} "
+                  f"rss={result['peak_rss_mb']}MB")
+    finally:
+        server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
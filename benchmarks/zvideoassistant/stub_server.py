@@ -0,0 +1,163 @@
+"""
+豆瓣及TMDB接口的本地替身，支持配置延迟及错误率，并统计各接口的调用次数
+"""
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class StubServer:
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, interest_size: int = 300, seed: int = 1):
+        """
+        :param latency: 每个请求的响应延迟（秒）
+        :param error_rate: 返回429/503的请求比例
+        :param interest_size: 用户在看/看过列表的条目数
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.interest_size = interest_size
+        self.calls = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+
+    def _route(self, method: str, host: str, path: str, query: dict) -> tuple:
+        """
+        :return: (状态码, 响应头, 响应体)
+        """
+        with self._lock:
+            failed = self._rng.random() < self.error_rate
+        if failed:
+            status = 429 if self._rng.random() < 0.5 else 503
+            return status, {"Retry-After": "0"}, b""
+        if path == "/" and method == "GET":
+            return 200, {"Set-Cookie": "ck=BeNc; Path=/; Domain=.douban.com"}, b"<html></html>"
+        match = re.fullmatch(r"/v2/movie/subject/(\d+)", path)
+        if match:
+            subject_id = int(match.group(1))
+            # 约10%的条目没有评分
+            if subject_id % 10 == 0:
+                return 200, {}, json.dumps({"rating": {"average": 0}}).encode()
+            return 200, {}, json.dumps({"rating": {"average": round(3 + subject_id % 66 / 10, 1)}}).encode()
+        if re.fullmatch(r"/j/subject/\d+/interest", path):
+            return 200, {}, b'{"r": 0}'
+        match = re.fullmatch(r"/people/\w+/(do|collect|wish)", path)
+        if match:
+            start = int(query.get("start", ["0"])[0])
+            offset = 1000001 if match.group(1) == "collect" else 1000001 + self.interest_size
+            items = "".join(f'<a href="https://movie.douban.com/subject/{offset + i}/">x</a>'
+                            for i in range(start, min(start + 30, self.interest_size)))
+            return 200, {}, f"<html>{items}</html>".encode()
+        match = re.fullmatch(r"/3/(movie|tv)/(\d+)", path)
+        if match:
+            tmdb_id = int(match.group(2))
+            if tmdb_id % 20 == 0:
+                return 404, {}, b"{}"
+            return 200, {}, json.dumps({"id": tmdb_id, "vote_average": round(5 + tmdb_id % 45 / 10, 1)}).encode()
+        return 404, {}, b""
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def _handle(self, method: str):
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+                url = urlparse(self.path)
+                host = self.headers.get("X-Stub-Host") or ""
+                with stub._lock:
+                    stub.calls[f"{host}{re.sub(r'/[0-9]{3,}', '/{id}', url.path)}"] += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+                status, headers, body = stub._route(method, host, url.path, parse_qs(url.query))
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+class StubAdapter(HTTPAdapter):
+    """
+    将会话中发往豆瓣等外部站点的请求改写到本地替身
+    """
+
+    def __init__(self, base_url: str, **kwargs):
+        super().__init__(**kwargs)
+        self.base_url = base_url
+
+    def send(self, request, **kwargs):
+        url = urlparse(request.url)
+        request.headers["X-Stub-Host"] = url.netloc
+        request.url = f"{self.base_url}{url.path}" + (f"?{url.query}" if url.query else "")
+        return super().send(request, **kwargs)
+
+
+class StubTmdbApi:
+    """
+    替代TmdbApi，get_info请求本地替身的/3/{movie|tv}/{id}
+    """
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.session = requests.Session()
+
+    def get_info(self, mtype, tmdbid) -> dict | None:
+        """
+        与TmdbApi一致，不抛出异常：请求失败（含限流）时返回None，未找到时返回空结果
+        """
+        kind = "tv" if getattr(mtype, "name", "") == "TV" else "movie"
+        try:
+            response = self.session.get(f"{self.base_url}/3/{kind}/{tmdbid}",
+                                        headers={"X-Stub-Host": "api.themoviedb.org"}, timeout=20)
+        except requests.RequestException:
+            return None
+        if response.status_code == 404:
+            return {}
+        if response.status_code != 200:
+            return None
+        return response.json()
@@ -0,0 +1,176 @@
+"""
+生成极影视数据库的合成数据，用于离线压测ZvideoAssistant
+
+    python synthetic.py /tmp/zvideo.db --rows 100000
+"""
+import argparse
+import gzip
+import json
+import random
+import sqlite3
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE zvideo_collection (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    collection_id TEXT NOT NULL,
+    type INTEGER NOT NULL,
+    extend_type INTEGER NOT NULL DEFAULT 0,
+    meta_info TEXT,
+    created_at INTEGER,
+    updated_at INTEGER
+);
+CREATE INDEX idx_zvideo_collection_collection_id ON zvideo_collection (collection_id);
+CREATE TABLE zvideo_playlist (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    collection_id TEXT NOT NULL,
+    episode_id TEXT,
+    position INTEGER,
+    updated_at INTEGER
+);
+CREATE TABLE zvideo_collection_tags (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    collection_id TEXT NOT NULL,
+    tag_name TEXT NOT NULL
+);
+"""
+
+GENRES = ["剧情", "喜剧", "动作", "爱情", "科幻", "动画", "悬疑", "惊悚", "犯罪", "纪录片"]
+WORDS = ["长安", "风起", "夜航", "星河", "归途", "迷雾", "山海", "雪国", "少年", "江湖", "city", "night", "river"]
+
+
+def meta_info(rng: random.Random, index: int, media_type: int, title_id: int,
+              unscored_ratio: float, collection_ids: list = None) -> dict:
+    """
+    构造与极影视结构相近的meta_info，包含较大的演职员及简介字段
+    """
+    title = "".join(rng.choice(WORDS) for _ in range(2)) + f"{title_id}"
+    douban_score = 0 if rng.random() < unscored_ratio else round(rng.uniform(3, 9.6), 1)
+    info = {
+        "title": title,
+        "original_title": title.upper(),
+        "type": media_type,
+        "score": round(rng.uniform(3, 9.6), 1),
+        "douban_score": douban_score,
+        "release_date": f"{rng.randint(1980, 2026)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "genres": rng.sample(GENRES, 3),
+        "overview": "。".join("".join(rng.choice(WORDS) for _ in range(8)) for _ in range(12)),
+        "cast": [{"name": f"演员{rng.randint(1, 99999)}", "character": f"角色{i}",
+                  "profile": f"/img/{rng.getrandbits(64):x}.jpg"} for i in range(rng.randint(5, 25))],
+        "relation": {
+            "douban": {"douban_id": str(1000000 + title_id)},
+            "tmdb": {"tmdb_id": 10000 + title_id},
+            "imdb": {"imdb_id": f"tt{1000000 + title_id:07d}"},
+        },
+    }
+    if collection_ids:
+        # 合集成员列表的字段名为假设，需开启插件的"合集评分取成员平均"
+        info["collection_ids"] = collection_ids
+    return info
+
+
+def generate(path: str, rows: int = 10000, duplicate_ratio: float = 0.1, unscored_ratio: float = 0.5,
+             playlist_ratio: float = 0.02, watched_ratio: float = 0.2, box_set_ratio: float = 0.01,
+             seed: int = 1) -> Path:
+    """
+    :param rows: zvideo_collection行数
+    :param duplicate_ratio: 与已有行共用douban_id/tmdb_id的行（同一影片的不同版本）比例
+    :param unscored_ratio: douban_score为0的行比例
+    :param playlist_ratio: 出现在播放列表中的行比例
+    :param watched_ratio: 带有“是否看过”标签的行比例
+    :param box_set_ratio: 合集（extend_type 7）行比例
+    """
+    rng = random.Random(seed)
+    path = Path(path)
+    path.unlink(missing_ok=True)
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+
+    def collection_rows():
+        title_id = 0
+        members = []
+        for index in range(rows):
+            collection_id = f"c{index:08d}"
+            media_type = 200 if rng.random() < 0.4 else 100
+            if rng.random() < box_set_ratio and members:
+                info = meta_info(rng, index, media_type, title_id, unscored_ratio,
+                                 collection_ids=rng.sample(members, min(len(members), rng.randint(2, 6))))
+                yield collection_id, media_type, 7, json.dumps(info, ensure_ascii=False), index, index
+                continue
+            if not (index and rng.random() < duplicate_ratio):
+                title_id += 1
+            info = meta_info(rng, index, media_type, title_id, unscored_ratio)
+            members.append(collection_id)
+            members = members[-50:]
+            yield collection_id, media_type, 0, json.dumps(info, ensure_ascii=False), index, index
+
+    conn.executemany(
+        "INSERT INTO zvideo_collection (collection_id, type, extend_type, meta_info, created_at, updated_at) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        collection_rows(),
+    )
+    conn.executemany(
+        "INSERT INTO zvideo_playlist (collection_id, episode_id, position) VALUES (?, ?, ?)",
+        ((f"c{index:08d}", f"e{index}", rng.randint(0, 3600)) for index in range(rows)
+         if rng.random() < playlist_ratio),
+    )
+    conn.executemany(
+        "INSERT INTO zvideo_collection_tags (collection_id, tag_name) VALUES (?, ?)",
+        ((f"c{index:08d}", "是否看过") for index in range(rows) if rng.random() < watched_ratio),
+    )
+    conn.commit()
+    conn.close()
+    return path
+
+
+def generate_imdb(directory: str, rows: int = 10000, coverage: float = 0.9, seed: int = 1) -> Path:
+    """
+    生成IMDb数据集title.ratings.tsv.gz，与generate生成的imdb id（tt1000001起）对应
+    :param rows: 与合成数据库对应的影片数，另加同样数量无关的评分行
+    :param coverage: 有IMDb评分的影片比例
+    """
+    rng = random.Random(seed)
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    with gzip.open(directory / "title.ratings.tsv.gz", "wt", encoding="utf-8") as f:
+        f.write("tconst\taverageRating\tnumVotes\n")
+        for title_id in range(1, rows * 2 + 1):
+            if title_id > rows or rng.random() < coverage:
+                f.write(f"tt{1000000 + title_id:07d}\t{rng.uniform(1, 10):.1f}\t{rng.randint(5, 500000)}\n")
+    return directory
+
+
+def generate_score_file(path: str, db_path: str, coverage: float = 0.8, seed: int = 1) -> Path:
+    """
+    按合成数据库中的豆瓣及tmdb id生成可供导入的评分CSV
+    :param coverage: 写入评分的影片比例
+    """
+    rng = random.Random(seed)
+    path = Path(path)
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute(
+            "SELECT DISTINCT JSON_EXTRACT(meta_info, '$.relation.douban.douban_id'), "
+            "JSON_EXTRACT(meta_info, '$.relation.tmdb.tmdb_id'), type FROM zvideo_collection WHERE extend_type != 7"
+        ).fetchall()
+    finally:
+        conn.close()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("douban_id,douban_score,tmdb_id,tmdb_score,type\n")
+        for douban_id, tmdb_id, media_type in rows:
+            if rng.random() < coverage:
+                f.write(f"{douban_id},{rng.uniform(3, 9.6):.1f},{tmdb_id},{rng.uniform(3, 9.6):.1f},"
+                        f"{'tv' if media_type == 200 else 'movie'}\n")
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成极影视合成数据库")
+    parser.add_argument("path")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.1)
+    parser.add_argument("--unscored-ratio", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    generate(args.path, rows=args.rows, duplicate_ratio=args.duplicate_ratio,
+             unscored_ratio=args.unscored_ratio, seed=args.seed)
@@ -0,0 +1,211 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Optional
+
+import requests
+from app.log import logger
+
+
+class CircuitOpenError(Exception):
+    """
+    连续失败次数达到阈值后熔断，本次运行剩余的请求直接失败
+    """
+    pass
+
+
+class ClientHelper:
+    """
+    外部接口的共享请求层：自适应限速（AIMD）、重试退避及熔断
+    """
+    # 需要重试的状态码
+    retry_status = (429, 500, 502, 503, 504)
+    # 视为被限流的状态码，命中后降低请求速率
+    throttle_status = (403, 429, 503)
+
+    def __init__(self, name: str,
+                 min_interval: float = 0.5,
+                 max_interval: float = 30,
+                 interval_step: float = 0.1,
+                 max_retries: int = 3,
+                 backoff_base: float = 1,
+                 backoff_max: float = 60,
+                 failure_threshold: int = 10,
+                 reset_timeout: float = 30 * 60):
+        """
+        :param name: 名称，用于日志
+        :param min_interval: 两次请求的最小间隔（秒）
+        :param max_interval: 限流时请求间隔的上限（秒）
+        :param interval_step: 请求成功后间隔的缩减步长（秒）
+        :param max_retries: 单次请求的最大重试次数
+        :param backoff_base: 重试退避的基准时间（秒）
+        :param backoff_max: 重试退避的上限（秒）
+        :param failure_threshold: 连续失败多少次后熔断
+        :param reset_timeout: 熔断后多久允许再次尝试（秒）
+        """
+        self.name = name
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval_step = interval_step
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.session = requests.Session()
+        # 当前运行的指标，由插件在运行开始时设置
+        self.metrics = None
+        # 累计发出的请求数（含重试），用于限制单次运行的请求预算
+        self.requests = 0
+        self._interval = min_interval
+        self._next_time = 0
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self._opened_at is not None and time.time() - self._opened_at < self.reset_timeout
+
+    def request(self, method: str, url: str,
+                is_failure: Callable[[requests.Response], bool] = None,
+                **kwargs) -> Optional[requests.Response]:
+        """
+        发送请求，限流及服务端错误时按退避重试
+        :param is_failure: 判断响应是否计为失败，默认4xx/5xx计为失败
+        :return: 最后一次的响应，网络异常时为None
+        """
+        kwargs.setdefault("timeout", 20)
+        response = None
+        for attempt in range(self.max_retries + 1):
+            self._acquire()
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.exceptions.RequestException as e:
+                logger.warning(f"{self.name}请求异常：{url} {e}")
+                response = None
+                self._record_http(started, ok=False)
+            else:
+                self._record_http(started, ok=response.status_code < 400)
+                self._adjust_rate(response)
+                if response.status_code not in self.retry_status:
+                    break
+            if attempt < self.max_retries:
+                time.sleep(self._backoff(attempt))
+        if response is None or (is_failure(response) if is_failure else response.status_code >= 400):
+            self._record_failure()
+        else:
+            self._record_success()
+        return response
+
+    def call(self, func: Callable, *args, is_failure: Callable[[Any], bool] = None, **kwargs) -> Any:
+        """
+        通过限速及熔断调用非HTTP接口（如TmdbApi），抛出异常或返回结果计为失败时按退避重试
+        TmdbApi内部捕获请求异常并返回None或空结果，因此需按返回值判断失败
+        :param is_failure: 判断返回值是否计为失败，默认None及空结果计为失败
+        :return: 最后一次的返回值，抛出异常时为None
+        """
+        result = None
+        for attempt in range(self.max_retries + 1):
+            self._acquire()
+            started = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                logger.warning(f"{self.name}调用异常：{e}")
+                result = None
+                failed = True
+            else:
+                failed = is_failure(result) if is_failure else not result
+            self._record_http(started, ok=not failed)
+            self._adjust_interval(failed)
+            if not failed:
+                self._record_success()
+                return result
+            if attempt < self.max_retries:
+                time.sleep(self._backoff(attempt))
+        self._record_failure()
+        return result
+
+    def _acquire(self):
+        """
+        等待到下一个允许请求的时间点，熔断中直接抛出异常
+        """
+        with self._lock:
+            if self._opened_at is not None:
+                if time.time() - self._opened_at < self.reset_timeout:
+                    raise CircuitOpenError(f"{self.name}已熔断")
+                # 熔断超时后放行一次试探请求，失败则重新熔断
+                self._opened_at = None
+                self._failures = self.failure_threshold - 1
+            now = time.time()
+            wait = self._next_time - now
+            self._next_time = max(now, self._next_time) + self._interval
+        if wait > 0:
+            time.sleep(wait)
+            metrics = self.metrics
+            if metrics:
+                metrics.record_time(f"throttle:{self.name}", wait)
+
+    def _adjust_rate(self, response: requests.Response):
+        """
+        AIMD：成功时线性缩短请求间隔，被限流时间隔加倍并遵循Retry-After
+        """
+        with self._lock:
+            if response.status_code in self.throttle_status:
+                self._interval = min(self.max_interval, self._interval * 2)
+                retry_after = self._retry_after(response)
+                if retry_after:
+                    self._next_time = max(self._next_time, time.time() + retry_after)
+                logger.warning(f"{self.name}触发限流 code={response.status_code}，"
+                               f"请求间隔调整为 {self._interval:.1f}s，Retry-After={retry_after}")
+            elif response.status_code < 400:
+                self._interval = max(self.min_interval, self._interval - self.interval_step)
+
+    def _adjust_interval(self, failed: bool):
+        """
+        AIMD：无响应可供判断限流的调用，失败时间隔加倍，成功时线性缩短
+        """
+        with self._lock:
+            if failed:
+                self._interval = min(self.max_interval, self._interval * 2)
+            else:
+                self._interval = max(self.min_interval, self._interval - self.interval_step)
+
+    def _retry_after(self, response: requests.Response) -> Optional[float]:
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            seconds = float(value)
+        except ValueError:
+            try:
+                seconds = parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                return None
+        return min(max(seconds, 0), self.backoff_max)
+
+    def _backoff(self, attempt: int) -> float:
+        # 指数退避加全抖动
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _record_http(self, started: float, ok: bool):
+        with self._lock:
+            self.requests += 1
+        metrics = self.metrics
+        if metrics:
+            metrics.record_http(self.name, time.perf_counter() - started, ok)
+
+    def _record_success(self):
+        with self._lock:
+            self._failures = 0
+
+    def _record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold and self._opened_at is None:
+                self._opened_at = time.time()
+                logger.error(f"{self.name}连续失败 {self._failures} 次，暂停请求 {self.reset_timeout / 60:.0f} 分钟")
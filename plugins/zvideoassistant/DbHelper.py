@@ -0,0 +1,162 @@
+import random
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Sequence
+
+from app.log import logger
+
+
+class DbHelper:
+    """
+    极影视数据库访问层，极影视运行时同时在使用该数据库：
+    读取使用只读连接，写入拆分为短事务并在数据库锁定时重试，WAL及回滚日志模式下均可使用
+    """
+
+    def __init__(self, db_path: str,
+                 busy_timeout: int = 5000,
+                 mmap_size: int = 256 * 1024 * 1024,
+                 read_chunk_size: int = 500,
+                 write_chunk_size: int = 200,
+                 max_retries: int = 5):
+        """
+        :param db_path: 极影视数据库路径
+        :param busy_timeout: 等待数据库锁的超时时间（毫秒）
+        :param mmap_size: 只读连接的内存映射大小（字节）
+        :param read_chunk_size: 分页读取时每页的行数
+        :param write_chunk_size: 每个写事务包含的行数
+        :param max_retries: 写事务因数据库锁定失败时的重试次数
+        """
+        self.db_path = db_path
+        self.busy_timeout = busy_timeout
+        self.mmap_size = mmap_size
+        self.read_chunk_size = read_chunk_size
+        self.write_chunk_size = write_chunk_size
+        self.max_retries = max_retries
+        # 当前运行的指标，由插件在运行开始时设置
+        self.metrics = None
+
+    @contextmanager
+    def timer(self) -> Iterator[None]:
+        """
+        统计语句耗时到当前运行的指标
+        """
+        metrics = self.metrics
+        if not metrics:
+            yield
+            return
+        with metrics.timer("sql"):
+            yield
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """
+        只读连接，自动提交模式下每条语句读取完成即释放共享锁，不阻塞极影视写入
+        """
+        conn = self._connect_readonly()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def iter_chunks(self, conn: sqlite3.Connection, sql: str, params: Sequence = (),
+                    start_key: Any = -2 ** 63, chunk_size: int = None) -> Iterator[List[tuple]]:
+        """
+        按键分页读取，每页一条短语句，读取完成即释放读锁，内存占用只与页大小相关
+        :param sql: 查询语句，参数为(*params, 上一页最后的键, 页大小)，结果首列为分页键且按其升序排列
+        :param start_key: 从大于该键的行开始读取
+        """
+        chunk_size = chunk_size or self.read_chunk_size
+        last_key = start_key
+        while True:
+            with self.timer():
+                rows = conn.execute(sql, (*params, last_key, chunk_size)).fetchall()
+            if not rows:
+                return
+            yield rows
+            if len(rows) < chunk_size:
+                return
+            last_key = rows[-1][0]
+
+    def _connect_readonly(self) -> sqlite3.Connection:
+        uri = f"{Path(self.db_path).absolute().as_uri()}?mode=ro"
+        try:
+            conn = sqlite3.connect(uri, uri=True, isolation_level=None,
+                                   timeout=self.busy_timeout / 1000, check_same_thread=False)
+            # WAL模式下只读连接需要能访问-shm文件，此处提前触发打开失败
+            conn.execute("SELECT 1 FROM sqlite_master LIMIT 1")
+        except sqlite3.OperationalError as e:
+            logger.debug(f"只读方式打开极影视数据库失败，改用query_only连接：{e}")
+            conn = sqlite3.connect(self.db_path, isolation_level=None,
+                                   timeout=self.busy_timeout / 1000, check_same_thread=False)
+            conn.execute("PRAGMA query_only = 1")
+        conn.text_factory = str
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout)}")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        return conn
+
+    def _connect_writer(self, attach: Dict[str, Path] = None) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, isolation_level=None,
+                               timeout=self.busy_timeout / 1000, check_same_thread=False)
+        conn.text_factory = str
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout)}")
+        for schema, path in (attach or {}).items():
+            # 附加的数据库只在语句中读取，写事务只获取其共享锁
+            conn.execute(f"ATTACH DATABASE ? AS {schema}", (str(path),))
+        return conn
+
+    def write_many(self, sql: str, params: Iterable[Sequence], chunk_size: int = None,
+                   attach: Dict[str, Path] = None) -> int:
+        """
+        分批执行写入语句，每批一个短事务，数据库锁定时退避重试
+        :param chunk_size: 每个事务包含的参数组数，默认为write_chunk_size
+        :param attach: 写入语句需要关联的其他数据库 {schema: 路径}
+        :return: 实际变更的行数
+        """
+        chunk_size = chunk_size or self.write_chunk_size
+        changed = 0
+        conn = self._connect_writer(attach=attach)
+        try:
+            chunk = []
+            for param in params:
+                chunk.append(param)
+                if len(chunk) >= chunk_size:
+                    with self.timer():
+                        changed += self._write_chunk(conn, sql, chunk)
+                    chunk = []
+            if chunk:
+                with self.timer():
+                    changed += self._write_chunk(conn, sql, chunk)
+        finally:
+            conn.close()
+        if self.metrics:
+            self.metrics.incr("rows_written", changed)
+        return changed
+
+    def _write_chunk(self, conn: sqlite3.Connection, sql: str, chunk: list) -> int:
+        for attempt in range(self.max_retries + 1):
+            try:
+                # 立即获取写锁，避免读锁升级为写锁时与极影视发生死锁
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    cursor = conn.executemany(sql, chunk)
+                    conn.execute("COMMIT")
+                    return cursor.rowcount
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+            except sqlite3.OperationalError as e:
+                if not self._is_locked(e) or attempt >= self.max_retries:
+                    raise
+                wait = random.uniform(0, min(5.0, 0.1 * 2 ** attempt))
+                logger.debug(f"极影视数据库被锁定，{wait:.2f}s后重试：{e}")
+                time.sleep(wait)
+                if self.metrics:
+                    self.metrics.record_time("sql_lock_wait", wait)
+        return 0
+
+    @staticmethod
+    def _is_locked(e: sqlite3.OperationalError) -> bool:
+        message = str(e).lower()
+        return "locked" in message or "busy" in message
@@ -1,23 +1,46 @@
+import hashlib
+import re
+import threading
+import time
 from http.cookies import SimpleCookie
+from typing import List, Optional
 
 import requests
 from app.helper.cookiecloud import CookieCloudHelper
 from app.log import logger
+from app.plugins.zvideoassistant.ClientHelper import ClientHelper
 
 
 class DoubanHelper:
+    """
+    豆瓣网页接口，可在多个线程中并发使用：请求头按次构建，不修改共享状态，
+    请求通过共享的连接池会话发出，限速及熔断由ClientHelper统一控制
+    """
+    # 响应未携带过期时间时，ck的默认有效期（秒）
+    default_ck_ttl = 24 * 60 * 60
+    # 个人观影列表每页条目数（列表模式）
+    interest_page_size = 30
 
-    def __init__(self, user_cookie: str = None):
+    def __init__(self, user_cookie: str = None, ck_cache: dict = None, client: ClientHelper = None):
+        """
+        :param user_cookie: 用户配置的豆瓣cookie，为空时从cookiecloud获取
+        :param ck_cache: 上次获取的ck缓存 {"ck": str, "expires": float, "cookie_key": str}，未过期时不再请求豆瓣首页
+        :param client: 共享的豆瓣请求层，负责限速、重试及熔断
+        """
+        self.client = client or ClientHelper("豆瓣网页")
+        # 并发请求同时认证失败时，只由一个线程重新获取ck
+        self._ck_lock = threading.Lock()
         if not user_cookie:
             self.cookiecloud = CookieCloudHelper()
             cookie_dict, msg = self.cookiecloud.download()
             if cookie_dict is None:
                 logger.error(f"获取cookiecloud数据错误 {msg}")
-            self.cookies = cookie_dict.get("douban.com")
+            self.cookies = (cookie_dict or {}).get("douban.com")
         else:
             self.cookies = user_cookie
         self.cookies = {k: v.value for k, v in SimpleCookie(self.cookies).items()}
         user_agent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/113.0.0.0 Safari/537.36 Edg/113.0.1774.57'
+        # 公共请求头，只读，各请求在其副本上设置Host、Referer及Cookie
         self.headers = {
             'User-Agent': user_agent,
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -25,7 +48,6 @@ class DoubanHelper:
             'Accept-Language': 'zh-CN,zh;q=0.8,en-US;q=0.6,en;q=0.4,en-GB;q=0.2,zh-TW;q=0.2',
             'Connection': 'keep-alive',
             'DNT': '1',
-            'HOST': 'www.douban.com'
         }
 
         if self.cookies.get('__utmz'):
@@ -35,36 +57,162 @@ class DoubanHelper:
         if self.cookies.get('ck'):
             self.cookies.pop("ck")
 
-        # 获取最新的ck
-        self.set_ck()
+        # ck与登录cookie绑定，cookie变化后缓存的ck失效
+        self.cookie_key = hashlib.md5(
+            ";".join([f"{key}={value}" for key, value in sorted(self.cookies.items())]).encode("utf-8")
+        ).hexdigest()
+        self.ck_expires = 0
+
+        if not self.cookies:
+            logger.error(f"cookie获取为空，请检查插件配置或cookie cloud")
+
+        # 优先使用未过期的缓存ck，否则获取最新的ck
+        if ck_cache and ck_cache.get("ck") and ck_cache.get("cookie_key") == self.cookie_key \
+                and (ck_cache.get("expires") or 0) > time.time():
+            self.cookies['ck'] = ck_cache.get("ck")
+            self.ck_expires = ck_cache.get("expires")
+            logger.debug(f"使用缓存的ck，有效期至 {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.ck_expires))}")
+        else:
+            self.set_ck()
 
         self.ck = self.cookies.get('ck')
         logger.debug(f"ck:{self.ck} cookie:{self.cookies}")
 
-        if not self.cookies:
-            logger.error(f"cookie获取为空，请检查插件配置或cookie cloud")
         if not self.ck:
             logger.error(f"请求ck失败，请检查传入的cookie登录状态")
 
+    @property
+    def ck_cache(self) -> dict:
+        """
+        当前ck及其过期时间，供插件持久化
+        """
+        return {"ck": self.ck, "expires": self.ck_expires, "cookie_key": self.cookie_key}
+
+    def _build_headers(self, host: str, referer: str = None, with_ck: bool = True, **extra) -> dict:
+        """
+        构建单次请求的请求头
+        :param with_ck: Cookie中是否包含ck
+        """
+        headers = {**self.headers, "Host": host, **extra}
+        if referer:
+            headers["Referer"] = referer
+        headers["Cookie"] = ";".join([f"{key}={value}" for key, value in self.cookies.items()
+                                      if with_ck or key != 'ck'])
+        return headers
+
     def set_ck(self):
-        self.headers["Cookie"] = ";".join([f"{key}={value}" for key, value in self.cookies.items()])
-        response = requests.get("https://www.douban.com/", headers=self.headers)
-        ck_str = response.headers.get('Set-Cookie', '')
-        logger.debug(ck_str)
-        if not ck_str:
+        response = self.client.request("get", "https://www.douban.com/",
+                                       headers=self._build_headers("www.douban.com", with_ck=False))
+        if response is None:
+            logger.error("获取ck失败：请求豆瓣首页失败")
+            self.cookies['ck'] = ''
+            self.ck_expires = 0
+            return
+        logger.debug(response.headers.get('Set-Cookie', ''))
+        ck_cookie = next((cookie for cookie in response.cookies if cookie.name == 'ck'), None)
+        if not ck_cookie or not ck_cookie.value:
             logger.error('获取ck失败，检查豆瓣登录状态')
             self.cookies['ck'] = ''
+            self.ck_expires = 0
             return
-        cookie_parts = ck_str.split(";")
-        ck = cookie_parts[0].split("=")[1].strip()
+        ck = ck_cookie.value.strip('"').strip()
         logger.debug(ck)
         self.cookies['ck'] = ck
+        self.ck_expires = ck_cookie.expires or time.time() + self.default_ck_ttl
+
+    def refresh_ck(self, failed_ck: str = None) -> bool:
+        """
+        认证失败时重新获取ck
+        :param failed_ck: 认证失败的请求使用的ck，已被其他线程刷新时不再重复获取
+        """
+        with self._ck_lock:
+            if failed_ck is not None and self.ck and self.ck != failed_ck:
+                return True
+            logger.info("豆瓣认证失败，重新获取ck")
+            self.set_ck()
+            self.ck = self.cookies.get('ck')
+            return bool(self.ck)
+
+    @staticmethod
+    def _is_auth_failure(response: requests.Response) -> bool:
+        if response.status_code in (401, 403):
+            return True
+        # 未登录或ck失效时会被重定向到登录页
+        return "accounts.douban.com" in (response.url or "")
+
+    def get_user_id(self) -> Optional[str]:
+        """
+        从登录cookie dbcl2="用户id:token" 中解析用户id
+        """
+        dbcl2 = (self.cookies.get('dbcl2') or '').strip('"')
+        return dbcl2.split(":")[0] if ":" in dbcl2 else None
+
+    def get_interest_subjects(self, status: str) -> Optional[List[str]]:
+        """
+        分页获取当前用户标记为指定状态的全部电影/电视剧
+        :param status: do 在看 / collect 看过 / wish 想看
+        :return: 豆瓣id列表，获取失败时返回None
+        """
+        user_id = self.get_user_id()
+        if not user_id:
+            logger.error("未能从cookie中解析豆瓣用户id")
+            return None
+        headers = self._build_headers("movie.douban.com", referer=f"https://movie.douban.com/people/{user_id}/")
+        subject_ids = []
+        seen_ids = set()
+        start = 0
+        while True:
+            response = self.client.request(
+                "get",
+                url=f"https://movie.douban.com/people/{user_id}/{status}",
+                params={"start": start, "sort": "time", "rating": "all", "filter": "all", "mode": "list"},
+                headers=headers)
+            if response is None or response.status_code != 200:
+                logger.error(f"获取豆瓣{status}列表失败,code={response.status_code if response is not None else None}")
+                return None
+            page_ids = [subject_id for subject_id in
+                        dict.fromkeys(re.findall(r'movie\.douban\.com/subject/(\d+)/', response.text))
+                        if subject_id not in seen_ids]
+            if not page_ids:
+                break
+            seen_ids.update(page_ids)
+            subject_ids.extend(page_ids)
+            if len(page_ids) < self.interest_page_size:
+                break
+            start += self.interest_page_size
+        logger.info(f"获取豆瓣{status}列表完成，共 {len(subject_ids)} 条")
+        return subject_ids
 
     def set_watching_status(self, subject_id: str, status: str = "do", private: bool = True) -> bool:
-        self.headers["Referer"] = f"https://movie.douban.com/subject/{subject_id}/"
-        self.headers["Origin"] = "https://movie.douban.com"
-        self.headers["Host"] = "movie.douban.com"
-        self.headers["Cookie"] = ";".join([f"{key}={value}" for key, value in self.cookies.items()])
+        ck = self.ck
+        try:
+            response = self._post_interest(subject_id=subject_id, status=status, private=private)
+            if response is not None and self._is_auth_failure(response) and self.refresh_ck(failed_ck=ck):
+                response = self._post_interest(subject_id=subject_id, status=status, private=private)
+            if not response:
+                return False
+            if self._is_auth_failure(response):
+                logger.error(f"douban_id: {subject_id} 标记失败，豆瓣登录已失效")
+                return False
+            # 正常情况 {"r":0}；cookie失效时可能返回200的登录页
+            ret = response.json().get("r") if response.status_code == 200 else None
+        except (ValueError, requests.RequestException) as e:
+            logger.error(f"douban_id: {subject_id} 标记失败：{e}")
+            return False
+        if response.status_code == 200:
+            r = False if (isinstance(ret, bool) and ret is False) else True
+            if r:
+                return True
+            # 未开播 {"r": false}
+            else:
+                logger.error(f"douban_id: {subject_id} 未开播")
+                return False
+        logger.error(response.text)
+        return False
+
+    def _post_interest(self, subject_id: str, status: str, private: bool) -> requests.Response | None:
+        headers = self._build_headers("movie.douban.com", referer=f"https://movie.douban.com/subject/{subject_id}/",
+                                      Origin="https://movie.douban.com")
         data_json = {
             "ck": self.ck,
             "interest": "do",
@@ -76,21 +224,10 @@ class DoubanHelper:
         if private:
             data_json["private"] = "on"
         data_json["interest"] = status
-        response = requests.post(
+        # 认证失败由调用方刷新ck后重试，不计入熔断
+        return self.client.request(
+            "post",
             url=f"https://movie.douban.com/j/subject/{subject_id}/interest",
-            headers=self.headers,
-            data=data_json)
-        if not response:
-            return False
-        if response.status_code == 200:
-            # 正常情况 {"r":0}
-            ret = response.json().get("r")
-            r = False if (isinstance(ret, bool) and ret is False) else True
-            if r:
-                return True
-            # 未开播 {"r": false}
-            else:
-                logger.error(f"douban_id: {subject_id} 未开播")
-                return False
-        logger.error(response.text)
-        return False
+            headers=headers,
+            data=data_json,
+            is_failure=lambda res: res.status_code >= 400 and not self._is_auth_failure(res))
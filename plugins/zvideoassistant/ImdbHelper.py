@@ -0,0 +1,160 @@
+import gzip
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from app.log import logger
+
+
+class ImdbHelper:
+    """
+    IMDb公开数据集（https://datasets.imdbws.com）的本地评分库
+    流式读取title.ratings.tsv.gz写入以tconst数字部分为主键的SQLite表，数据集文件变化后重新导入
+    同目录下存在title.basics.tsv.gz时，剔除单集（tvEpisode）的评分以缩小评分库
+    """
+    ratings_file = "title.ratings.tsv.gz"
+    basics_file = "title.basics.tsv.gz"
+    # 每批写入的行数
+    batch_size = 50000
+
+    def __init__(self, dataset_dir: str, db_path: Path):
+        """
+        :param dataset_dir: 数据集所在目录，也可直接指定title.ratings.tsv.gz的路径
+        :param db_path: 本地评分库路径
+        """
+        path = Path(dataset_dir or "")
+        self.dataset_dir = path.parent if path.name == self.ratings_file else path
+        self.db_path = Path(db_path)
+        # 多个极影视实例并发运行时只导入一次
+        self._lock = threading.Lock()
+
+    @property
+    def ratings_path(self) -> Path:
+        return self.dataset_dir / self.ratings_file
+
+    @property
+    def basics_path(self) -> Path:
+        return self.dataset_dir / self.basics_file
+
+    def ensure(self) -> bool:
+        """
+        评分库不存在或数据集文件有变化时导入
+        :return: 评分库是否可用
+        """
+        if not self.ratings_path.exists():
+            logger.error(f"IMDb数据集不存在：{self.ratings_path}")
+            return self.db_path.exists()
+        with self._lock:
+            if self.is_stale():
+                self.ingest()
+        return True
+
+    def is_stale(self) -> bool:
+        if not self.ratings_path.exists():
+            return False
+        if not self.db_path.exists():
+            return True
+        try:
+            with closing(sqlite3.connect(self.db_path)) as conn:
+                row = conn.execute("SELECT value FROM imdb_meta WHERE key = 'source'").fetchone()
+        except sqlite3.Error:
+            return True
+        return not row or json.loads(row[0]) != self._source_fingerprint()
+
+    def ingest(self) -> int:
+        """
+        流式导入数据集，先写入临时文件，完成后替换评分库，导入失败时保留原评分库
+        :return: 评分条数
+        """
+        started = time.time()
+        tmp_path = self.db_path.with_name(f"{self.db_path.name}.tmp")
+        tmp_path.unlink(missing_ok=True)
+        fingerprint = self._source_fingerprint()
+        try:
+            with closing(sqlite3.connect(tmp_path, isolation_level=None)) as conn:
+                conn.execute("PRAGMA journal_mode = OFF")
+                conn.execute("PRAGMA synchronous = OFF")
+                conn.execute("CREATE TABLE imdb_rating ("
+                             "tconst INTEGER PRIMARY KEY, "
+                             "rating REAL NOT NULL, "
+                             "votes INTEGER NOT NULL)")
+                conn.execute("CREATE TABLE imdb_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+                self._write_batches(conn, "INSERT OR REPLACE INTO imdb_rating (tconst, rating, votes) VALUES (?, ?, ?)",
+                                    self._read_ratings())
+                if self.basics_path.exists():
+                    self._write_batches(conn, "DELETE FROM imdb_rating WHERE tconst = ?", self._read_episodes())
+                count = conn.execute("SELECT COUNT(*) FROM imdb_rating").fetchone()[0]
+                conn.execute("INSERT INTO imdb_meta (key, value) VALUES ('source', ?)", (json.dumps(fingerprint),))
+                conn.execute("VACUUM")
+            os.replace(tmp_path, self.db_path)
+        except Exception:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        logger.info(f"IMDb评分导入完成，共 {count} 条，耗时 {time.time() - started:.1f}s")
+        return count
+
+    def _write_batches(self, conn: sqlite3.Connection, sql: str, rows: Iterator[tuple]):
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                self._write_batch(conn, sql, batch)
+                batch = []
+        if batch:
+            self._write_batch(conn, sql, batch)
+
+    @staticmethod
+    def _write_batch(conn: sqlite3.Connection, sql: str, batch: list):
+        conn.execute("BEGIN")
+        conn.executemany(sql, batch)
+        conn.execute("COMMIT")
+
+    def _read_ratings(self) -> Iterator[Tuple[int, float, int]]:
+        """
+        :return: (tconst数字部分, 评分, 票数)
+        """
+        for fields in self._read_tsv(self.ratings_path):
+            try:
+                yield self.parse_tconst(fields[0]), float(fields[1]), int(fields[2])
+            except (IndexError, TypeError, ValueError):
+                continue
+
+    def _read_episodes(self) -> Iterator[Tuple[int]]:
+        for fields in self._read_tsv(self.basics_path):
+            if len(fields) > 1 and fields[1] == "tvEpisode":
+                tconst = self.parse_tconst(fields[0])
+                if tconst is not None:
+                    yield tconst,
+
+    @staticmethod
+    def _read_tsv(path: Path) -> Iterator[List[str]]:
+        with gzip.open(path, "rt", encoding="utf-8", newline="") as f:
+            # 首行为表头
+            next(f, None)
+            for line in f:
+                yield line.rstrip("\n").split("\t")
+
+    @staticmethod
+    def parse_tconst(tconst: str) -> Optional[int]:
+        """
+        tt0111161 -> 111161
+        """
+        if not tconst or not tconst.startswith("tt"):
+            return None
+        try:
+            return int(tconst[2:])
+        except ValueError:
+            return None
+
+    def _source_fingerprint(self) -> List[list]:
+        fingerprint = []
+        for path in (self.ratings_path, self.basics_path):
+            if path.exists():
+                stat = path.stat()
+                fingerprint.append([path.name, stat.st_mtime_ns, stat.st_size])
+        return fingerprint
@@ -0,0 +1,106 @@
+import csv
+import gzip
+import json
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from app.log import logger
+
+
+class ImportHelper:
+    """
+    流式读取其他工具导出的评分文件（CSV或JSON lines，可为.gz压缩），校验后逐条返回
+    支持的字段：
+        douban_id, douban_score
+        tmdb_id, tmdb_score, type（movie/tv或100/200；tmdb_id也可写作movie/550、tv/1399）
+        或通用格式 source（douban/tmdb）, id, score, type
+    """
+    # tmdb的电影与电视剧id互相独立，缓存键需带上类型
+    tmdb_types = {"movie": "movie", "100": "movie", "tv": "tv", "200": "tv"}
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        # 统计：导入条数及各类被跳过的原因
+        self.stats = Counter()
+
+    def records(self) -> Iterator[Tuple[str, str, float]]:
+        """
+        :return: (source, external_id, 评分)
+        """
+        for row in self._rows():
+            self.stats["rows"] += 1
+            found = False
+            for record in self._parse(row):
+                found = True
+                if record:
+                    self.stats[record[0]] += 1
+                    yield record
+            if not found:
+                self.stats["skipped"] += 1
+
+    def _rows(self) -> Iterator[Dict[str, Any]]:
+        opener = gzip.open if self.path.suffix == ".gz" else open
+        suffixes = self.path.suffixes
+        is_csv = ".csv" in suffixes or ".tsv" in suffixes
+        with opener(self.path, "rt", encoding="utf-8-sig", newline="") as f:
+            if is_csv:
+                yield from csv.DictReader(f, dialect="excel-tab" if ".tsv" in suffixes else "excel")
+                return
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    logger.debug(f"第 {line_no} 行不是有效的JSON，跳过")
+                    self.stats["invalid"] += 1
+                    continue
+                if isinstance(row, dict):
+                    yield row
+
+    def _parse(self, row: Dict[str, Any]) -> Iterator[Optional[Tuple[str, str, float]]]:
+        """
+        一行可同时包含豆瓣及tmdb评分，校验失败的评分返回None
+        """
+        row = {str(key).strip().lower(): value for key, value in row.items() if key is not None}
+        source = str(row.get("source") or "").strip().lower()
+        if source in ("douban", "tmdb"):
+            row.setdefault(f"{source}_id", row.get("id"))
+            row.setdefault(f"{source}_score", row.get("score"))
+        if row.get("douban_id") not in (None, "") or row.get("douban_score") not in (None, ""):
+            yield self._validate("douban", self._douban_id(row.get("douban_id")), row.get("douban_score"))
+        if row.get("tmdb_id") not in (None, "") or row.get("tmdb_score") not in (None, ""):
+            yield self._validate("tmdb", self._tmdb_key(row.get("tmdb_id"), row.get("type") or row.get("media_type")),
+                                 row.get("tmdb_score"))
+
+    def _validate(self, source: str, external_id: Optional[str], score: Any) -> Optional[Tuple[str, str, float]]:
+        if not external_id:
+            self.stats["invalid_id"] += 1
+            return None
+        try:
+            score = round(float(score), 1)
+        except (TypeError, ValueError):
+            self.stats["invalid_score"] += 1
+            return None
+        # 0表示无评分
+        if not 0 < score <= 10:
+            self.stats["invalid_score"] += 1
+            return None
+        return source, external_id, score
+
+    @staticmethod
+    def _douban_id(value: Any) -> Optional[str]:
+        value = str(value or "").strip()
+        return value if value.isdigit() else None
+
+    @classmethod
+    def _tmdb_key(cls, value: Any, media_type: Any) -> Optional[str]:
+        value = str(value or "").strip()
+        if "/" in value:
+            media_type, value = value.split("/", 1)
+        media_type = cls.tmdb_types.get(str(media_type or "").strip().lower())
+        if not media_type or not value.isdigit():
+            return None
+        return f"{media_type}/{int(value)}"
@@ -0,0 +1,217 @@
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.log import logger
+
+
+class JobCancelledError(Exception):
+    """
+    任务已被取消，在任务线程的检查点抛出
+    """
+    pass
+
+
+class Job:
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    def __init__(self, action: str, name: str):
+        self.id = uuid.uuid4().hex[:8]
+        self.action = action
+        self.name = name
+        self.status = Job.QUEUED
+        self.progress: Optional[float] = None
+        self.message = ""
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel_event = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    @property
+    def active(self) -> bool:
+        return self.status in (Job.QUEUED, Job.RUNNING)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "action": self.action,
+            "name": self.name,
+            "status": self.status,
+            "progress": self.progress,
+            "message": self.message,
+            "error": self.error,
+            "cancel_requested": self.cancelled,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobHelper:
+    """
+    单线程后台任务队列：任务依次执行，同一操作排队或运行中时不重复提交
+    任务函数在检查点通过check_cancelled响应取消，通过report上报进度
+    """
+
+    def __init__(self, history_size: int = 20):
+        """
+        :param history_size: 保留的已结束任务数
+        """
+        self.history_size = history_size
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queue: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, action: str, name: str, func: Callable[[], Any],
+               on_done: Callable[[Job], None] = None) -> Tuple[Job, bool]:
+        """
+        提交任务
+        :param action: 操作标识，相同操作排队或运行中时返回已有任务
+        :param name: 任务名称
+        :param on_done: 任务结束（含失败及取消）后在任务线程中回调
+        :return: 任务、是否为新提交
+        """
+        with self._lock:
+            for job in self._jobs.values():
+                if job.action == action and job.active and not job.cancelled:
+                    return job, False
+            job = Job(action=action, name=name)
+            self._jobs[job.id] = job
+            self._trim()
+            self._queue.put((job, func, on_done))
+            if not self._thread or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="zvideoassistant-job", daemon=True)
+                self._thread.start()
+        logger.info(f"已提交任务 {job.id}：{name}")
+        return job, True
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[Job]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id: str = None) -> Optional[Job]:
+        """
+        取消任务，排队中的任务直接取消，运行中的任务在下一个检查点停止
+        :param job_id: 任务id，为空时取消当前运行的任务
+        """
+        with self._lock:
+            if job_id:
+                job = self._jobs.get(job_id)
+            else:
+                job = next((job for job in self._jobs.values() if job.status == Job.RUNNING), None)
+            if not job or not job.active:
+                return job
+            job._cancel_event.set()
+            if job.status == Job.QUEUED:
+                job.status = Job.CANCELLED
+                job.finished_at = time.time()
+        logger.info(f"已请求取消任务 {job.id}：{job.name}")
+        return job
+
+    def current(self) -> Optional[Job]:
+        """
+        调用线程正在执行的任务，非任务线程（如定时服务）为None
+        """
+        return getattr(self._local, "job", None)
+
+    @contextmanager
+    def bind(self, job: Optional[Job]):
+        """
+        在其他线程中执行任务的一部分时绑定该任务，使检查点及进度上报对该线程生效
+        """
+        previous = getattr(self._local, "job", None)
+        self._local.job = job
+        try:
+            yield
+        finally:
+            self._local.job = previous
+
+    def is_cancelled(self) -> bool:
+        job = self.current()
+        return bool(job and job.cancelled)
+
+    def check_cancelled(self):
+        if self.is_cancelled():
+            raise JobCancelledError(f"任务 {self.current().id} 已取消")
+
+    def report(self, message: str, progress: float = None):
+        """
+        上报当前任务的进度
+        :param progress: 0~1之间的完成比例，未知时为None
+        """
+        job = self.current()
+        if not job:
+            return
+        job.message = message
+        if progress is not None:
+            job.progress = round(min(max(progress, 0), 1), 4)
+
+    def stop(self):
+        """
+        取消全部任务并停止任务线程
+        """
+        for job in self.list():
+            if job.active:
+                self.cancel(job.id)
+        thread = self._thread
+        if thread and thread.is_alive():
+            self._queue.put(None)
+            if thread is not threading.current_thread():
+                thread.join(timeout=5)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            job, func, on_done = item
+            if not job.cancelled:
+                self._execute(job, func)
+            if on_done:
+                try:
+                    on_done(job)
+                except Exception as e:
+                    logger.error(f"任务 {job.id} 结束回调失败：{e}")
+
+    def _execute(self, job: Job, func: Callable[[], Any]):
+        job.status = Job.RUNNING
+        job.started_at = time.time()
+        self._local.job = job
+        try:
+            func()
+            job.status = Job.DONE
+            job.progress = 1
+        except JobCancelledError:
+            job.status = Job.CANCELLED
+            logger.info(f"任务 {job.id}：{job.name} 已取消")
+        except Exception as e:
+            job.status = Job.FAILED
+            job.error = str(e)
+            logger.error(f"任务 {job.id}：{job.name} 执行失败：{e}")
+        finally:
+            job.finished_at = time.time()
+            self._local.job = None
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self._jobs.items() if not job.active]
+        for job_id in finished[:max(0, len(finished) - self.history_size)]:
+            del self._jobs[job_id]
@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+
+class RunMetrics:
+    """
+    单次运行的指标：扫描及写入行数、各接口的调用次数与延迟、本地缓存命中率、数据库与网络耗时
+    运行期间可随时获取快照
+    """
+
+    def __init__(self, name: str):
+        """
+        :param name: 运行名称，如定时任务、使用豆瓣评分
+        """
+        self.name = name
+        self.started_at = time.time()
+        self.finished_at = None
+        self.counters = Counter()
+        self._latencies: Dict[str, List[float]] = {}
+        self._errors = Counter()
+        self._timings = Counter()
+        self._lock = threading.Lock()
+        # 开启性能剖析时的剖析器，各项耗时同时计入其直方图
+        self.profiler = None
+
+    def incr(self, key: str, value: int = 1):
+        with self._lock:
+            self.counters[key] += value
+
+    def record_http(self, source: str, seconds: float, ok: bool):
+        """
+        记录一次外部接口请求
+        :param source: 接口名称，如豆瓣、TMDB
+        :param ok: 请求是否成功
+        """
+        with self._lock:
+            self._latencies.setdefault(source, []).append(seconds)
+            if not ok:
+                self._errors[source] += 1
+            self._timings["network"] += seconds
+        if self.profiler:
+            self.profiler.record(f"http:{source}", seconds)
+
+    def record_time(self, kind: str, seconds: float):
+        with self._lock:
+            self._timings[kind] += seconds
+        if self.profiler:
+            self.profiler.record(kind, seconds)
+
+    @contextmanager
+    def timer(self, kind: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_time(kind, time.perf_counter() - started)
+
+    def finish(self) -> dict:
+        self.finished_at = time.time()
+        return self.snapshot()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+            latencies = {source: sorted(values) for source, values in self._latencies.items()}
+            errors = dict(self._errors)
+            timings = dict(self._timings)
+        lookups = counters.get("cache_lookups", 0)
+        return {
+            "name": self.name,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "running": self.finished_at is None,
+            "duration": round((self.finished_at or time.time()) - self.started_at, 3),
+            "counters": counters,
+            "cache_hit_ratio": round(counters.get("cache_hits", 0) / lookups, 4) if lookups else None,
+            "http": {
+                source: {
+                    "calls": len(values),
+                    "errors": errors.get(source, 0),
+                    "p50": self._percentile(values, 50),
+                    "p90": self._percentile(values, 90),
+                    "p99": self._percentile(values, 99),
+                } for source, values in latencies.items()
+            },
+            "sql_seconds": round(timings.get("sql", 0), 3),
+            "network_seconds": round(timings.get("network", 0), 3),
+        }
+
+    @staticmethod
+    def _percentile(values: List[float], percent: int) -> Optional[float]:
+        """
+        最近秩法计算百分位，values需已排序
+        """
+        if not values:
+            return None
+        index = max(0, min(len(values) - 1, -(-len(values) * percent // 100) - 1))
+        return round(values[index], 4)
@@ -0,0 +1,154 @@
+import bisect
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+class RunProfiler:
+    """
+    单次运行的性能剖析，用于定位慢运行的耗时：
+    定时采样插件线程的调用栈，统计自身及累计耗时最多的函数；
+    并按类别（SQL、JSON、HTTP、限速等待等）汇总各次耗时的分布直方图
+    """
+    # 直方图各桶的上限（秒），超过最后一个上限的计入最后一桶
+    buckets = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+
+    def __init__(self, name: str, interval: float = 0.01, thread_prefix: str = "zvideoassistant", top: int = 30):
+        """
+        :param name: 运行名称
+        :param interval: 采样间隔（秒）
+        :param thread_prefix: 只采样名称以此开头的线程
+        :param top: 报告中列出的函数数量
+        """
+        self.name = name
+        self.interval = interval
+        self.thread_prefix = thread_prefix
+        self.top = top
+        self.started_at = time.time()
+        self.finished_at = None
+        # 采样次数及各线程被采样到的总次数
+        self.samples = 0
+        self.thread_samples = 0
+        self._self = Counter()
+        self._cumulative = Counter()
+        self._spans: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # 开始剖析的线程，未在插件线程中运行时也采样该线程
+        self._owner = None
+
+    def start(self):
+        self._owner = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name="profiler-zvideoassistant", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Dict[str, Any]:
+        """
+        停止采样
+        :return: 剖析报告
+        """
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.finished_at = time.time()
+        return self.report()
+
+    def record(self, kind: str, seconds: float):
+        """
+        记录一次耗时
+        :param kind: 类别，如sql、json、http:豆瓣
+        """
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            span = self._spans.get(kind)
+            if not span:
+                span = self._spans[kind] = {"count": 0, "total": 0.0, "max": 0.0,
+                                            "histogram": [0] * (len(self.buckets) + 1)}
+            span["count"] += 1
+            span["total"] += seconds
+            span["max"] = max(span["max"], seconds)
+            span["histogram"][index] += 1
+
+    @contextmanager
+    def span(self, kind: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(kind, time.perf_counter() - started)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self):
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        frames = sys._current_frames()
+        self_counts = Counter()
+        cumulative_counts = Counter()
+        threads = 0
+        for ident, frame in frames.items():
+            if ident == own or (ident != self._owner and not names.get(ident, "").startswith(self.thread_prefix)):
+                continue
+            threads += 1
+            self_counts[self._label(frame)] += 1
+            # 递归调用在同一调用栈中只计一次
+            stack = set()
+            while frame is not None:
+                stack.add(self._label(frame))
+                frame = frame.f_back
+            cumulative_counts.update(stack)
+        with self._lock:
+            self.samples += 1
+            self.thread_samples += threads
+            self._self.update(self_counts)
+            self._cumulative.update(cumulative_counts)
+
+    @staticmethod
+    def _label(frame) -> str:
+        code = frame.f_code
+        path = Path(code.co_filename)
+        return f"{code.co_name} ({path.parent.name}/{path.name}:{code.co_firstlineno})"
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            thread_samples = self.thread_samples
+            top_self = self._self.most_common(self.top)
+            top_cumulative = self._cumulative.most_common(self.top)
+            spans = {kind: dict(span, histogram=list(span["histogram"])) for kind, span in self._spans.items()}
+        labels = [f"<={bucket * 1000:g}ms" for bucket in self.buckets] + [f">{self.buckets[-1] * 1000:g}ms"]
+        return {
+            "name": self.name,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration": round((self.finished_at or time.time()) - self.started_at, 3),
+            "interval": self.interval,
+            "samples": self.samples,
+            "thread_samples": thread_samples,
+            # 自身耗时：采样时正在执行该函数；累计耗时：该函数在调用栈中
+            "top_self": self._top(top_self, thread_samples),
+            "top_cumulative": self._top(top_cumulative, thread_samples),
+            "spans": {
+                kind: {
+                    "count": span["count"],
+                    "total": round(span["total"], 3),
+                    "mean": round(span["total"] / span["count"], 4),
+                    "max": round(span["max"], 4),
+                    "histogram": dict(zip(labels, span["histogram"])),
+                } for kind, span in sorted(spans.items(), key=lambda item: -item[1]["total"])
+            },
+        }
+
+    def _top(self, counts: List[tuple], thread_samples: int) -> List[Dict[str, Any]]:
+        return [{
+            "function": label,
+            "samples": samples,
+            "seconds": round(samples * self.interval, 3),
+            "ratio": round(samples / thread_samples, 4) if thread_samples else None,
+        } for label, samples in counts]
@@ -0,0 +1,166 @@
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from app.log import logger
+from app.plugins.zvideoassistant.ClientHelper import ClientHelper, CircuitOpenError
+from app.plugins.zvideoassistant.ScoreHelper import ScoreHelper
+from app.schemas.types import MediaType
+
+# 因停止或熔断未查询的id
+_SKIPPED = object()
+
+
+class ScoreProvider(ABC):
+    """
+    在线评分来源：按外部id批量查询评分，每个来源使用独立的ClientHelper限速、重试及熔断，
+    并按workers并发查询。新增来源只需实现key、missing及fetch
+    """
+    # 来源标识，同时用作评分缓存的source
+    source = ""
+    # 来源名称，用于日志及通知
+    name = ""
+    # meta_info中保存该来源评分的字段
+    field = ""
+    # 评分缓存键在SQL中的表达式，用于按外部id从评分缓存补全
+    cache_key_sql = ""
+    # meta_info中评分缺失的SQL条件
+    missing_sql = ""
+
+    def __init__(self, client: ClientHelper, workers: int = 1):
+        """
+        :param client: 该来源的请求层
+        :param workers: 批量查询时的并发数
+        """
+        self.client = client
+        self.workers = workers
+
+    def applicable(self, fields: Dict[str, Any]) -> bool:
+        """
+        该行是否使用此来源
+        """
+        return True
+
+    @abstractmethod
+    def missing(self, fields: Dict[str, Any]) -> bool:
+        """
+        该行的评分是否缺失，需要查询
+        """
+
+    @abstractmethod
+    def key(self, fields: Dict[str, Any]) -> Optional[str]:
+        """
+        外部id，无法查询时为None
+        """
+
+    @abstractmethod
+    def fetch(self, fields: Dict[str, Any]) -> Optional[float]:
+        """
+        查询单条评分，未找到时为None，熔断时抛出CircuitOpenError
+        """
+
+    def lookup(self, items: Dict[str, Dict[str, Any]],
+               stop: Callable[[], bool] = None) -> Dict[str, Optional[float]]:
+        """
+        批量查询评分
+        :param items: {外部id: 评分字段}
+        :param stop: 返回True时不再发起新的查询
+        :return: {外部id: 评分}，未找到评分或查询出错时为None；因停止或熔断未查询的id不在结果中
+        """
+        circuit_open = threading.Event()
+
+        def fetch(item):
+            key, fields = item
+            if circuit_open.is_set() or (stop and stop()):
+                return key, _SKIPPED
+            try:
+                return key, self.fetch(fields)
+            except CircuitOpenError:
+                circuit_open.set()
+                return key, _SKIPPED
+            except Exception as e:
+                # 单条查询出错（如接口返回无法解析的内容）按未找到处理，稍后重试，不影响同批已获取的评分
+                logger.error(f"查询{self.name}评分出错：{key} {e}")
+                return key, None
+
+        if self.workers > 1 and len(items) > 1:
+            with ThreadPoolExecutor(max_workers=self.workers,
+                                    thread_name_prefix=f"zvideoassistant-{self.source}") as executor:
+                results = list(executor.map(fetch, items.items()))
+        else:
+            results = [fetch(item) for item in items.items()]
+        return {key: score for key, score in results if score is not _SKIPPED}
+
+
+class DoubanScoreProvider(ScoreProvider):
+    """
+    豆瓣评分，meta_info中没有douban_score字段的行不使用豆瓣评分，0表示缺失
+    """
+    source = "douban"
+    name = "豆瓣"
+    field = "douban_score"
+    cache_key_sql = "CAST(JSON_EXTRACT(meta_info, '$.relation.douban.douban_id') AS TEXT)"
+    missing_sql = "JSON_EXTRACT(meta_info, '$.douban_score') = 0"
+
+    def __init__(self, score_helper: ScoreHelper, workers: int = 2):
+        super().__init__(client=score_helper.client, workers=workers)
+        self.score_helper = score_helper
+
+    def applicable(self, fields: Dict[str, Any]) -> bool:
+        return fields.get("douban_score") is not None
+
+    def missing(self, fields: Dict[str, Any]) -> bool:
+        return fields.get("douban_score") == 0
+
+    def key(self, fields: Dict[str, Any]) -> Optional[str]:
+        douban_id = fields.get("douban_id")
+        return str(douban_id) if douban_id not in (None, "") else None
+
+    def fetch(self, fields: Dict[str, Any]) -> Optional[float]:
+        return self.score_helper.get_douban_score(douban_id=fields.get("douban_id"), title=fields.get("title"))
+
+
+class TmdbScoreProvider(ScoreProvider):
+    """
+    TMDB评分，保存在custom_tmdb_score，字段不存在表示缺失
+    电影与电视剧的tmdb id互相独立，外部id形如movie/550、tv/1399
+    """
+    source = "tmdb"
+    name = "tmdb"
+    field = "custom_tmdb_score"
+    cache_key_sql = ("(CASE JSON_EXTRACT(meta_info, '$.type') WHEN 100 THEN 'movie/' WHEN 200 THEN 'tv/' END)"
+                     " || CAST(JSON_EXTRACT(meta_info, '$.relation.tmdb.tmdb_id') AS TEXT)")
+    missing_sql = "JSON_EXTRACT(meta_info, '$.custom_tmdb_score') IS NULL"
+    # 100代表电影，200代表电视剧
+    media_types = {100: ("movie", MediaType.MOVIE), 200: ("tv", MediaType.TV)}
+
+    def __init__(self, tmdb: Any, client: ClientHelper, workers: int = 4):
+        """
+        :param tmdb: TmdbApi
+        """
+        super().__init__(client=client, workers=workers)
+        self.tmdb = tmdb
+
+    def missing(self, fields: Dict[str, Any]) -> bool:
+        return fields.get("custom_tmdb_score") is None
+
+    def key(self, fields: Dict[str, Any]) -> Optional[str]:
+        media_type = self.media_types.get(fields.get("type"))
+        if not media_type or fields.get("tmdb_id") in (None, ""):
+            return None
+        return f"{media_type[0]}/{fields['tmdb_id']}"
+
+    def fetch(self, fields: Dict[str, Any]) -> Optional[float]:
+        media_type = self.media_types.get(fields.get("type"))
+        if not media_type:
+            logger.error(f"未知type类型：title={fields.get('title')} tmdbid={fields.get('tmdb_id')} "
+                         f"type={fields.get('type')}")
+            return None
+        # TmdbApi请求失败（含限流及服务端错误）时返回None，条目不存在时返回空结果，不计为接口失败
+        tmdb_info = self.client.call(self.tmdb.get_info, mtype=media_type[1], tmdbid=fields.get("tmdb_id"),
+                                     is_failure=lambda info: info is None)
+        if not tmdb_info or tmdb_info.get("vote_average") is None:
+            logger.warning(f"未找到tmdb评分：title={fields.get('title')} tmdbid={fields.get('tmdb_id')}")
+            return None
+        return tmdb_info["vote_average"]
@@ -1,10 +1,10 @@
 from app.log import logger
-from app.utils.http import RequestUtils
+from app.plugins.zvideoassistant.ClientHelper import ClientHelper
 
 
 class ScoreHelper:
 
-    def __init__(self, apikey: str):
+    def __init__(self, apikey: str, client: ClientHelper = None):
         user_agent = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/127.0.0.0 Safari/537.36'
         self.headers = {
             'User-Agent': user_agent,
@@ -14,21 +14,32 @@ class ScoreHelper:
             'Connection': 'keep-alive',
         }
         self.apikey = apikey
+        self.client = client or ClientHelper("豆瓣")
 
     def get_douban_score(self, douban_id: str = None, title: str = None) -> float | None:
         data = {"apikey": self.apikey}
 
-        response = RequestUtils(headers=self.headers).post_res(
+        # 条目不存在(404)不计为接口失败
+        response = self.client.request(
+            "post",
             url=f"https://api.douban.com/v2/movie/subject/{douban_id}",
-            json=data
+            json=data,
+            headers=self.headers,
+            is_failure=lambda res: res.status_code >= 400 and res.status_code != 404,
         )
 
-        if not response.status_code == 200:
-            logger.debug(f"获取豆瓣评分失败,code={response.status_code},title={title},douban_id={douban_id}")
+        if response is None or not response.status_code == 200:
+            logger.debug(f"获取豆瓣评分失败,code={response.status_code if response is not None else None},"
+                         f"title={title},douban_id={douban_id}")
             return None
 
-        json = response.json()
-        if json and json['rating'] and json['rating']['average']:
+        try:
+            json = response.json()
+        except ValueError:
+            # 被风控时可能返回200的HTML页面
+            logger.error(f"获取豆瓣评分失败,api接口返回内容无法解析,title={title},douban_id={douban_id}")
+            return None
+        if json and json.get('rating') and json['rating'].get('average'):
             score = json['rating']['average']
             return float(score)
         else:
@@ -0,0 +1,178 @@
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.log import logger
+
+
+class StoreHelper:
+    """
+    插件本地存储，保存在插件数据目录下，记录增量处理所需的状态
+    """
+    # 单条语句中IN参数的最大数量，低于SQLite默认的变量数上限
+    chunk_size = 500
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        with self._connect() as conn:
+            # 已处理行的评分摘要，摘要不变的行无需重复处理；评分获取失败的行记录重试时间
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS collection_digest ("
+                "id INTEGER PRIMARY KEY, "
+                "digest INTEGER NOT NULL, "
+                "retry_at REAL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_collection_digest_retry_at ON collection_digest (retry_at)"
+            )
+            # 评分的最近获取时间，用于按陈旧程度刷新评分；未由插件获取的评分记录首次发现的时间
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS score_refresh ("
+                "id INTEGER PRIMARY KEY, "
+                "refreshed_at REAL NOT NULL)"
+            )
+            # 按外部id缓存的评分，来源为接口获取或导入，source为douban/tmdb，tmdb的id形如movie/550
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS score_cache ("
+                "source TEXT NOT NULL, "
+                "external_id TEXT NOT NULL, "
+                "score REAL NOT NULL, "
+                "updated_at REAL NOT NULL, "
+                "PRIMARY KEY (source, external_id)) WITHOUT ROWID"
+            )
+            # 已同步到豆瓣的观影状态
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS douban_status ("
+                "douban_id TEXT PRIMARY KEY, "
+                "status TEXT NOT NULL, "
+                "updated_at REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get_digests(self, ids: Iterable[int]) -> Dict[int, Tuple[int, Optional[float]]]:
+        """
+        批量查询摘要
+        :return: {id: (摘要, 重试时间)}，没有摘要的id不在结果中
+        """
+        ids = list(ids)
+        digests = {}
+        with self._connect() as conn:
+            for i in range(0, len(ids), self.chunk_size):
+                chunk = ids[i:i + self.chunk_size]
+                digests.update((rowid, (digest, retry_at)) for rowid, digest, retry_at in conn.execute(
+                    f"SELECT id, digest, retry_at FROM collection_digest WHERE id IN ({', '.join('?' * len(chunk))})",
+                    chunk,
+                ))
+        return digests
+
+    def get_next_retry(self) -> Optional[float]:
+        with self._connect() as conn:
+            return conn.execute("SELECT MIN(retry_at) FROM collection_digest").fetchone()[0]
+
+    def save_digests(self, digests: List[Tuple[int, int, Optional[float]]]):
+        """
+        :param digests: [(id, 摘要, 重试时间)]，无需重试时重试时间为None
+        """
+        if not digests:
+            return
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO collection_digest (id, digest, retry_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET digest = excluded.digest, retry_at = excluded.retry_at",
+                digests,
+            )
+        logger.debug(f"保存评分摘要 {len(digests)} 条")
+
+    def clear_digests(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM collection_digest")
+
+    def get_refresh_times(self, min_id: int, max_id: int) -> Dict[int, float]:
+        """
+        查询id区间内评分的最近获取时间
+        :return: {id: 获取时间}
+        """
+        with self._connect() as conn:
+            return dict(conn.execute("SELECT id, refreshed_at FROM score_refresh WHERE id BETWEEN ? AND ?",
+                                     (min_id, max_id)))
+
+    def save_refresh_times(self, ids: List[int], first_seen: bool = False):
+        """
+        记录评分的获取时间为当前时间
+        :param first_seen: 只为尚无记录的id记录首次发现时间，不覆盖已有记录
+        """
+        if not ids:
+            return
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO score_refresh (id, refreshed_at) VALUES (?, ?) "
+                + ("ON CONFLICT(id) DO NOTHING" if first_seen
+                   else "ON CONFLICT(id) DO UPDATE SET refreshed_at = excluded.refreshed_at"),
+                [(rowid, now) for rowid in ids],
+            )
+
+    def clear_refresh_times(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM score_refresh")
+
+    def save_cached_scores(self, scores: List[Tuple[str, str, float]]):
+        """
+        :param scores: [(source, external_id, 评分)]，同一事务写入
+        """
+        if not scores:
+            return
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO score_cache (source, external_id, score, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(source, external_id) DO UPDATE SET score = excluded.score, updated_at = excluded.updated_at",
+                [(source, str(external_id), score, now) for source, external_id, score in scores],
+            )
+        logger.debug(f"保存评分缓存 {len(scores)} 条")
+
+    def get_statuses(self, douban_ids: Iterable[str]) -> Dict[str, str]:
+        """
+        批量查询豆瓣观影状态
+        :return: {douban_id: status}，未同步过的douban_id不在结果中
+        """
+        douban_ids = list({str(douban_id) for douban_id in douban_ids})
+        statuses = {}
+        with self._connect() as conn:
+            for i in range(0, len(douban_ids), self.chunk_size):
+                chunk = douban_ids[i:i + self.chunk_size]
+                statuses.update(conn.execute(
+                    f"SELECT douban_id, status FROM douban_status "
+                    f"WHERE douban_id IN ({', '.join('?' * len(chunk))})",
+                    chunk,
+                ))
+        return statuses
+
+    def save_statuses(self, statuses: List[Tuple[str, str]]):
+        """
+        :param statuses: [(douban_id, status)]
+        """
+        if not statuses:
+            return
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO douban_status (douban_id, status, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(douban_id) DO UPDATE SET status = excluded.status, updated_at = excluded.updated_at",
+                [(str(douban_id), status, now) for douban_id, status in statuses],
+            )
+        logger.debug(f"保存豆瓣观影状态 {len(statuses)} 条")
+
+    def clear_statuses(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM douban_status")
@@ -1,20 +1,38 @@
+import copy
+import heapq
 import json
 import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from enum import Enum
+from functools import partial
+from itertools import chain
 from pathlib import Path
-from typing import Any, List, Dict, Tuple, Optional
+from typing import Any, Callable, Iterator, List, Dict, Tuple, Optional
 
 import pytz
+from fastapi.responses import FileResponse
 from app.core.config import settings
 from app.core.event import eventmanager, Event
 from app.log import logger
 from app.modules.themoviedb.tmdbapi import TmdbApi
 from app.plugins import _PluginBase
+from app.plugins.zvideoassistant.ClientHelper import ClientHelper, CircuitOpenError
+from app.plugins.zvideoassistant.DbHelper import DbHelper
 from app.plugins.zvideoassistant.DoubanHelper import *
+from app.plugins.zvideoassistant.ImdbHelper import ImdbHelper
+from app.plugins.zvideoassistant.ImportHelper import ImportHelper
+from app.plugins.zvideoassistant.JobHelper import Job, JobCancelledError, JobHelper
+from app.plugins.zvideoassistant.MetricsHelper import RunMetrics
+from app.plugins.zvideoassistant.ProfileHelper import RunProfiler
+from app.plugins.zvideoassistant.ProviderHelper import DoubanScoreProvider, ScoreProvider, TmdbScoreProvider
 from app.plugins.zvideoassistant.ScoreHelper import *
+from app.plugins.zvideoassistant.StoreHelper import StoreHelper
 from app.schemas.types import EventType, NotificationType
-from app.schemas.types import MediaType
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 
@@ -33,7 +51,7 @@ class ZvideoAssistant(_PluginBase):
     # 插件图标
     plugin_icon = "zvideo.png"
     # 插件版本
-    plugin_version = "1.2"
+    plugin_version = "2.4"
     # 插件作者
     plugin_author = "fx786595833"
     # 作者主页
@@ -54,14 +72,111 @@ class ZvideoAssistant(_PluginBase):
     _clean_cache = False
     _use_douban_score = False
     _use_tmdb_score = False
+    _use_imdb_score = False
+    _imdb_path = ""
+    _refresh_stale_score = False
+    _refresh_limit = 100
+    _refresh_minutes = 10
+    _score_limit = 0
+    _score_minutes = 0
+    _watch_db = False
+    _profile = False
+    # 合集的score取成员平均，依赖meta_info中的成员列表，默认关闭
+    _collection_score = False
+    _score_priority: List[str] = []
+    _instances_config = ""
     _douban_helper = None
-    _cached_data: dict = {}
+    _douban_client: ClientHelper = None
+    _douban_web_client: ClientHelper = None
+    _tmdb_client: ClientHelper = None
+    _scan_state: dict = {}
+    _store: StoreHelper = None
+    # 评分缓存，各极影视实例共用主实例的本地存储
+    _cache: StoreHelper = None
+    # 其他极影视实例的状态，运行时覆盖到插件副本上，见__instance_engine
+    _instances: List[Dict[str, Any]] = []
+    # 实例标识，主实例为空，用于区分各实例保存的插件数据
+    _instance_key = ""
+    # 多实例并发运行时共用的评分查询结果
+    _shared_lookups: Optional[dict] = None
+    _lookups_lock: threading.Lock = None
+    _db: DbHelper = None
+    _imdb: ImdbHelper = None
+    # 在线评分来源 {source: ScoreProvider}
+    _providers: Dict[str, ScoreProvider] = {}
+    # 当前运行的指标
+    _metrics: Optional[RunMetrics] = None
+    # 后台任务
+    _jobs: JobHelper = None
     _db_path = ""
     _apikey = ""
     _cookie = ""
     # 定时器
     _scheduler: Optional[BackgroundScheduler] = None
+    # 数据库监视：最近观察到的指纹及其出现时间，已提交运行的指纹
+    _watch_fingerprint = None
+    _watch_changed_at = 0
+    _watch_submitted = None
     tmdb: TmdbApi = None
+    # 评分相关的meta_info字段，处理时只在数据库中提取这些标量
+    _score_fields = {
+        "title": "$.title",
+        "type": "$.type",
+        "douban_score": "$.douban_score",
+        "custom_tmdb_score": "$.custom_tmdb_score",
+        "douban_id": "$.relation.douban.douban_id",
+        "tmdb_id": "$.relation.tmdb.tmdb_id",
+    }
+    # 刷新过期评分时额外提取上映日期及IMDb评分
+    _refresh_fields = {**_score_fields, "custom_imdb_score": "$.custom_imdb_score", "release_date": "$.release_date"}
+    # 评分来源及其在meta_info中的字段，默认按此顺序确定score
+    _score_sources = {"douban": "douban_score", "tmdb": "custom_tmdb_score", "imdb": "custom_imdb_score"}
+    # 参与摘要的字段，字段不变的行无需重复处理
+    _digest_fields = ("type", "douban_score", "custom_tmdb_score", "douban_id", "tmdb_id")
+    # 同步score时每个写事务覆盖的id区间大小
+    _apply_range = 500
+    # 通知中保留的明细条数
+    _message_limit = 50
+    # 获取失败的记录重试间隔（秒）
+    _retry_interval = 24 * 60 * 60
+    # 豆瓣在看/看过标记快照的有效期（秒）
+    _snapshot_ttl = 24 * 60 * 60
+    # 过期评分的刷新间隔（秒）
+    _refresh_interval = 24 * 60 * 60
+    # 评分刷新周期的下限及上限（秒），新上映的影片接近下限，上映越久越接近上限
+    _refresh_min_period = 7 * 24 * 60 * 60
+    _refresh_max_period = 365 * 24 * 60 * 60
+    # 监视数据库的轮询间隔及写入平稳等待时间（秒）
+    _watch_interval = 15
+    _watch_debounce = 30
+    # 并发同步豆瓣观影状态的线程数
+    _status_workers = 4
+    # 更新评分时每批获取的行数，每批写回后保存检查点
+    _checkpoint_size = 20
+    # 更新评分时优先处理的最近新增影片条数
+    _priority_recent = 200
+    # 导入评分时每个事务写入的条数
+    _import_batch_size = 5000
+    # 保留的运行指标条数
+    _metrics_history_size = 30
+    # 保留的性能剖析报告个数
+    _profile_history_size = 20
+    # 后台任务可执行的操作：操作 -> (任务名称, 方法名)
+    _job_actions = {
+        "do_job": ("同步评分&在看状态", "do_job"),
+        "sync_status_to_douban": ("同步极影视观影状态", "sync_douban_status"),
+        "sync_douban_score": ("使用豆瓣评分", "use_douban_score"),
+        "sync_tmdb_score": ("使用tmdb评分", "use_tmdb_score"),
+        "zvideo_sync_imdb_score": ("使用IMDb评分", "use_imdb_score"),
+        "zvideo_refresh_stale_score": ("刷新过期评分", "refresh_stale_scores"),
+        "zvideo_import_scores": ("导入评分", "import_scores"),
+    }
+    # 任务结束状态对应的通知
+    _job_results = {
+        Job.DONE: "完成",
+        Job.FAILED: "失败",
+        Job.CANCELLED: "已取消",
+    }
 
     def init_plugin(self, config: dict = None):
         # 停止现有任务
@@ -79,21 +194,75 @@ class ZvideoAssistant(_PluginBase):
             self._clean_cache = config.get("clean_cache")
             self._use_douban_score = config.get("use_douban_score")
             self._use_tmdb_score = config.get("use_tmdb_score")
-            self._douban_helper = DoubanHelper(user_cookie=self._cookie)
-            self._score_helper = ScoreHelper(apikey=self._apikey)
+            self._use_imdb_score = config.get("use_imdb_score")
+            self._imdb_path = config.get("imdb_path")
+            self._refresh_stale_score = config.get("refresh_stale_score")
+            self._refresh_limit = self.__to_int(config.get("refresh_limit"), 100)
+            self._refresh_minutes = self.__to_int(config.get("refresh_minutes"), 10)
+            self._score_limit = self.__to_int(config.get("score_limit"), 0)
+            self._score_minutes = self.__to_int(config.get("score_minutes"), 0)
+            self._watch_db = config.get("watch_db")
+            self._profile = config.get("profile")
+            self._collection_score = config.get("collection_score")
+            self._score_priority = self.__parse_priority(config.get("score_priority"))
+            self._instances_config = config.get("instances") or ""
+            self._db = DbHelper(self._db_path)
+            # 豆瓣助手在首次使用时再创建，避免加载插件时请求cookiecloud及豆瓣
+            self._douban_helper = None
+            # 豆瓣评分接口（apikey）与网页（cookie）分别使用独立的请求层，apikey失效熔断时不影响观影状态同步
+            self._douban_client = ClientHelper("豆瓣")
+            self._douban_web_client = ClientHelper("豆瓣网页")
+            self._tmdb_client = ClientHelper("TMDB", min_interval=0.1)
+            self._score_helper = ScoreHelper(apikey=self._apikey, client=self._douban_client)
             self.tmdb = TmdbApi()
+            self._providers = {
+                "douban": DoubanScoreProvider(self._score_helper),
+                "tmdb": TmdbScoreProvider(self.tmdb, client=self._tmdb_client),
+            }
 
-        # 获取历史数据
-        self._cached_data = (
-            self.get_data("zvideoassistant")
-            if self.get_data("zvideoassistant") != None
-            else dict()
-        )
+        # 后台任务，停止插件时取消
+        self._jobs = JobHelper()
+        self._lookups_lock = threading.Lock()
+        self._watch_fingerprint = None
+        self._watch_submitted = None
+        # 增量处理状态
+        self._scan_state = self.get_data("scan_state") or {}
+        self._store = StoreHelper(self.get_data_path() / "zvideoassistant.db")
+        self._cache = self._store
+        self._instances = []
+        for db_path, cookie in self.__parse_instances(self._instances_config):
+            if not Path(db_path).exists():
+                logger.error(f"极影视数据库路径不存在: {db_path}")
+                continue
+            # 按数据库路径生成实例标识，调整配置顺序时各实例的本地存储及处理状态不变
+            key = f"{zlib.crc32(str(Path(db_path).resolve()).encode('utf-8')):08x}"
+            if any(instance["_instance_key"] == key for instance in self._instances):
+                logger.warning(f"极影视数据库路径重复，已忽略: {db_path}")
+                continue
+            self._instances.append({
+                "_instance_key": key,
+                "_db_path": db_path,
+                "_cookie": cookie,
+                "_db": DbHelper(db_path),
+                "_store": StoreHelper(self.get_data_path() / f"zvideoassistant_{key}.db"),
+                "_scan_state": self.get_data(f"scan_state_{key}") or {},
+                "_douban_helper": None,
+            })
+        self._imdb = ImdbHelper(self._imdb_path, self.get_data_path() / "imdb.db") if self._imdb_path else None
         # 加载模块
         if self._onlyonce:
             if self._clean_cache:
-                self._cached_data = {}
-                self.save_data("zvideoassistant", self._cached_data)
+                self._store.clear_statuses()
+                self._scan_state = {}
+                self.save_data(self.__data_key("scan_state"), self._scan_state)
+                self._store.clear_digests()
+                self._store.clear_refresh_times()
+                for instance in self._instances:
+                    instance["_store"].clear_statuses()
+                    instance["_store"].clear_digests()
+                    instance["_store"].clear_refresh_times()
+                    instance["_scan_state"].clear()
+                    self.save_data(f"scan_state_{instance['_instance_key']}", {})
                 self._clean_cache = False
             # 检查数据库路径是否存在
             path = Path(self._db_path)
@@ -113,7 +282,8 @@ class ZvideoAssistant(_PluginBase):
             self._scheduler = BackgroundScheduler(timezone=settings.TZ)
             logger.info(f"极影视助手（API）版服务启动，立即运行一次")
             self._scheduler.add_job(
-                func=self.do_job,
+                func=self.submit_job,
+                kwargs={"action": "do_job"},
                 trigger="date",
                 run_date=datetime.now(tz=pytz.timezone(settings.TZ)) + timedelta(seconds=3),
                 name="极影视助手（API）版",
@@ -144,9 +314,57 @@ class ZvideoAssistant(_PluginBase):
                 "clean_cache": self._clean_cache,
                 "use_douban_score": self._use_douban_score,
                 "use_tmdb_score": self._use_tmdb_score,
+                "use_imdb_score": self._use_imdb_score,
+                "imdb_path": self._imdb_path,
+                "refresh_stale_score": self._refresh_stale_score,
+                "refresh_limit": self._refresh_limit,
+                "refresh_minutes": self._refresh_minutes,
+                "score_limit": self._score_limit,
+                "score_minutes": self._score_minutes,
+                "watch_db": self._watch_db,
+                "profile": self._profile,
+                "collection_score": self._collection_score,
+                "score_priority": ",".join(self._score_priority),
+                "instances": self._instances_config,
             }
         )
 
+    @classmethod
+    def __parse_priority(cls, value: Any) -> List[str]:
+        """
+        解析评分优先级，如"tmdb,douban,imdb"，未列出的来源按默认顺序排在最后
+        """
+        sources = [source.strip().lower() for source in str(value or "").replace("，", ",").split(",")]
+        priority = [source for source in dict.fromkeys(sources) if source in cls._score_sources]
+        return priority + [source for source in cls._score_sources if source not in priority]
+
+    def __score_chain(self, use_douban: bool, use_tmdb: bool, use_imdb: bool = False) -> List[str]:
+        """
+        按优先级排列的已启用评分来源
+        """
+        enabled = {"douban": use_douban, "tmdb": use_tmdb, "imdb": use_imdb}
+        return [source for source in self._score_priority or self._score_sources if enabled[source]]
+
+    @staticmethod
+    def __parse_instances(value: str) -> List[Tuple[str, str]]:
+        """
+        解析其他极影视实例，每行一个：数据库路径|豆瓣cookie，cookie为空时从cookiecloud获取
+        :return: [(数据库路径, cookie)]
+        """
+        instances = []
+        for line in (value or "").splitlines():
+            db_path, _, cookie = line.strip().partition("|")
+            if db_path.strip():
+                instances.append((db_path.strip(), cookie.strip()))
+        return instances
+
+    @staticmethod
+    def __to_int(value: Any, default: int) -> int:
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return default
+
     @staticmethod
     def get_command() -> List[Dict[str, Any]]:
         """
@@ -175,63 +393,188 @@ class ZvideoAssistant(_PluginBase):
                 "category": "",
                 "data": {"action": "sync_tmdb_score"},
             },
+            {
+                "cmd": "/zvideo_sync_imdb_score",
+                "event": EventType.PluginAction,
+                "desc": "极影视使用IMDb评分",
+                "category": "",
+                "data": {"action": "zvideo_sync_imdb_score"},
+            },
+            {
+                "cmd": "/zvideo_refresh_score",
+                "event": EventType.PluginAction,
+                "desc": "极影视刷新过期评分",
+                "category": "",
+                "data": {"action": "zvideo_refresh_stale_score"},
+            },
+            {
+                "cmd": "/zvideo_import_scores",
+                "event": EventType.PluginAction,
+                "desc": "极影视导入评分文件",
+                "category": "",
+                "data": {"action": "zvideo_import_scores"},
+            },
+            {
+                "cmd": "/zvideo_cancel",
+                "event": EventType.PluginAction,
+                "desc": "取消极影视助手任务",
+                "category": "",
+                "data": {"action": "zvideo_cancel_job"},
+            },
         ]
 
     @eventmanager.register(EventType.PluginAction)
     def handle_command(self, event: Event):
-        if event:
-            event_data = event.event_data
-            if event_data:
-                if (
-                        event_data.get("action") == "sync_status_to_douban"
-                        or event_data.get("action") == "sync_douban_score"
-                        or event_data.get("action") == "sync_tmdb_score"
-                ):
-                    if event_data.get("action") == "sync_status_to_douban":
-                        logger.info("收到命令，开始同步极影视观影状态 ...")
-                        self.post_message(
-                            channel=event.event_data.get("channel"),
-                            title="开始同步极影视观影状态 ...",
-                            userid=event.event_data.get("user"),
-                        )
-                        self.sync_douban_status()
-                        if event:
-                            self.post_message(
-                                channel=event.event_data.get("channel"),
-                                title="同步极影视观影状态完成！",
-                                userid=event.event_data.get("user"),
-                            )
-                    elif event_data.get("action") == "sync_douban_score":
-                        logger.info("收到命令，开始使用豆瓣评分 ...")
-                        self.post_message(
-                            channel=event.event_data.get("channel"),
-                            title="开始使用豆瓣评分 ...",
-                            userid=event.event_data.get("user"),
-                        )
-                        self.use_douban_score()
-                        if event:
-                            self.post_message(
-                                channel=event.event_data.get("channel"),
-                                title="使用豆瓣评分完成！",
-                                userid=event.event_data.get("user"),
-                            )
-                    elif event_data.get("action") == "sync_tmdb_score":
-                        logger.info("收到命令，开始使用tmdb评分 ...")
-                        self.post_message(
-                            channel=event.event_data.get("channel"),
-                            title="开始使用tmdb评分 ...",
-                            userid=event.event_data.get("user"),
-                        )
-                        self.use_tmdb_score()
-                        if event:
-                            self.post_message(
-                                channel=event.event_data.get("channel"),
-                                title="使用tmdb评分完成！",
-                                userid=event.event_data.get("user"),
-                            )
+        """
+        远程命令只提交后台任务并立即回复任务id，任务结束后再通知结果
+        """
+        if not event or not event.event_data:
+            return
+        event_data = event.event_data
+        action = event_data.get("action")
+        channel = event_data.get("channel")
+        userid = event_data.get("user")
+        if action == "zvideo_cancel_job":
+            job = self._jobs.cancel(job_id=(event_data.get("arg_str") or "").strip() or None)
+            self.post_message(
+                channel=channel,
+                title=f"已请求取消任务 {job.id}：{job.name}" if job else "没有运行中的任务",
+                userid=userid,
+            )
+            return
+        if action not in self._job_actions:
+            return
+        kwargs = {}
+        if action == "zvideo_import_scores":
+            kwargs["path"] = (event_data.get("arg_str") or "").strip()
+            if not kwargs["path"]:
+                self.post_message(channel=channel, title="请指定评分文件路径，如 /zvideo_import_scores /config/scores.csv",
+                                  userid=userid)
+                return
+
+        def notify_done(finished_job: Job):
+            self.post_message(
+                channel=channel,
+                title=f"{finished_job.name}{self._job_results.get(finished_job.status, '结束')}！",
+                text=finished_job.error or finished_job.message or None,
+                userid=userid,
+            )
+
+        job, created = self.submit_job(action=action, on_done=notify_done, **kwargs)
+        logger.info(f"收到命令，{job.name}，任务id：{job.id}")
+        self.post_message(
+            channel=channel,
+            title=f"开始{job.name} ...，任务id：{job.id}" if created else f"{job.name}已在执行中，任务id：{job.id}",
+            userid=userid,
+        )
+
+    def submit_job(self, action: str, on_done: Callable[[Job], None] = None, **kwargs) -> Tuple[Job, bool]:
+        """
+        提交后台任务，所有运行（定时及命令）在同一任务线程中依次执行
+        :param action: 操作，见_job_actions
+        :param on_done: 任务结束后的回调
+        :param kwargs: 传给操作方法的参数
+        :return: 任务、是否为新提交（相同操作已在排队或运行中时为False）
+        """
+        name, method = self._job_actions[action]
+        if action in ("do_job", "zvideo_import_scores"):
+            # do_job及导入自行在各实例上运行（导入只需读取一次评分文件）
+            func = partial(getattr(self, method), **kwargs)
+        else:
+            func = partial(self.__run_instances, name, lambda engine: getattr(engine, method)(**kwargs))
+        return self._jobs.submit(action=action, name=name, func=func, on_done=on_done)
+
+    def __check_job(self, message: str, progress: float = None):
+        """
+        任务检查点：上报进度，任务已取消时抛出JobCancelledError
+        """
+        self._jobs.report(message, progress)
+        self._jobs.check_cancelled()
+
+    def get_jobs(self, job_id: str = None) -> Dict[str, Any]:
+        """
+        API：查询任务状态，未指定job_id时返回最近的任务列表
+        """
+        if job_id:
+            job = self._jobs.get(job_id)
+            if not job:
+                return {"success": False, "message": f"任务不存在：{job_id}"}
+            return {"success": True, "data": job.to_dict()}
+        return {"success": True, "data": [job.to_dict() for job in self._jobs.list()]}
+
+    def import_scores_api(self, path: str) -> Dict[str, Any]:
+        """
+        API：提交评分导入任务
+        :param path: 评分文件路径（MoviePilot容器内）
+        """
+        if not path or not Path(path).is_file():
+            return {"success": False, "message": f"评分文件不存在：{path}"}
+        job, created = self.submit_job(action="zvideo_import_scores", path=path)
+        return {"success": True, "data": job.to_dict()}
+
+    def cancel_job(self, job_id: str = None) -> Dict[str, Any]:
+        """
+        API：取消任务，未指定job_id时取消当前运行的任务
+        """
+        job = self._jobs.cancel(job_id=job_id)
+        if not job:
+            return {"success": False, "message": "任务不存在或没有运行中的任务"}
+        return {"success": True, "data": job.to_dict()}
 
     def get_api(self) -> List[Dict[str, Any]]:
-        pass
+        """
+        获取插件API
+        [{
+            "path": "/xx",
+            "endpoint": self.xxx,
+            "methods": ["GET", "POST"],
+            "summary": "API说明"
+        }]
+        """
+        return [
+            {
+                "path": "/metrics",
+                "endpoint": self.get_metrics,
+                "methods": ["GET"],
+                "summary": "运行指标",
+                "description": "当前运行及最近运行的扫描行数、接口调用及耗时",
+            },
+            {
+                "path": "/jobs",
+                "endpoint": self.get_jobs,
+                "methods": ["GET"],
+                "summary": "任务状态",
+                "description": "查询后台任务的状态及进度，不传job_id时返回最近的任务",
+            },
+            {
+                "path": "/import_scores",
+                "endpoint": self.import_scores_api,
+                "methods": ["POST"],
+                "summary": "导入评分",
+                "description": "从CSV或JSON lines文件导入豆瓣/tmdb评分，返回后台任务",
+            },
+            {
+                "path": "/profiles",
+                "endpoint": self.get_profiles,
+                "methods": ["GET"],
+                "summary": "性能剖析报告",
+                "description": "开启性能剖析后各次运行保存的报告列表",
+            },
+            {
+                "path": "/profiles/download",
+                "endpoint": self.download_profile,
+                "methods": ["GET"],
+                "summary": "下载性能剖析报告",
+                "description": "下载指定的性能剖析报告（耗时最多的函数及SQL、JSON、HTTP耗时分布）",
+            },
+            {
+                "path": "/jobs/cancel",
+                "endpoint": self.cancel_job,
+                "methods": ["POST"],
+                "summary": "取消任务",
+                "description": "取消指定的后台任务，不传job_id时取消当前运行的任务",
+            },
+        ]
 
     def get_service(self) -> List[Dict[str, Any]]:
         """
@@ -244,381 +587,1287 @@ class ZvideoAssistant(_PluginBase):
             "kwargs": {} # 定时器参数
         }]
         """
+        services = []
         if self._enabled and self._cron:
-            return [
-                {
-                    "id": "ZvideoAssistant",
-                    "name": "同步评分&在看状态",
-                    "trigger": CronTrigger.from_crontab(self._cron),
-                    "func": self.do_job,
-                    "kwargs": {},
-                }
-            ]
+            services.append({
+                "id": "ZvideoAssistant",
+                "name": "同步评分&在看状态",
+                "trigger": CronTrigger.from_crontab(self._cron),
+                "func": partial(self.submit_job, "do_job"),
+                "kwargs": {},
+            })
+        if self._enabled and self._watch_db:
+            services.append({
+                "id": "ZvideoAssistantWatch",
+                "name": "监视极影视数据库",
+                "trigger": "interval",
+                "func": self.watch_db,
+                "kwargs": {"seconds": self._watch_interval},
+            })
+        return services
+
+    def watch_db(self):
+        """
+        轮询极影视数据库文件及其-wal文件的修改时间和大小，变化后等待写入平稳再提交增量运行，
+        连续的写入合并为一次运行；本插件写回后记录的指纹不会再次触发
+        """
+        if not self._db or not self._jobs:
+            return
+        # 多个实例时任一实例的数据库变化即提交运行，未变化的实例在运行中直接跳过
+        engines = [self] + [self.__instance_engine(instance) for instance in self._instances]
+        fingerprint = [engine.__db_fingerprint() for engine in engines]
+        if fingerprint == [engine._scan_state.get("fingerprint") for engine in engines] \
+                or fingerprint == self._watch_submitted:
+            return
+        now = time.time()
+        if fingerprint != self._watch_fingerprint:
+            # 仍在写入，重新计时
+            self._watch_fingerprint = fingerprint
+            self._watch_changed_at = now
+            return
+        if now - self._watch_changed_at < self._watch_debounce:
+            return
+        # 有任务排队或运行时等待其结束，其写入会计入运行后记录的指纹
+        if any(job.active for job in self._jobs.list()):
+            return
+        logger.info("检测到极影视数据库变化，提交增量运行")
+        # 同一指纹只提交一次，运行失败时不反复重试
+        self._watch_submitted = fingerprint
+        self.submit_job("do_job")
+
+    def __get_douban_helper(self) -> DoubanHelper:
+        """
+        延迟创建豆瓣助手，复用未过期的ck缓存
+        """
+        if not self._douban_helper:
+            self._douban_helper = DoubanHelper(user_cookie=self._cookie,
+                                               ck_cache=self.get_data(self.__data_key("douban_ck")),
+                                               client=self._douban_web_client)
+            self.__save_douban_ck()
+        return self._douban_helper
+
+    def __save_douban_ck(self):
+        key = self.__data_key("douban_ck")
+        if self._douban_helper and self._douban_helper.ck_cache != self.get_data(key):
+            self.save_data(key, self._douban_helper.ck_cache)
+
+    def __data_key(self, key: str) -> str:
+        """
+        插件数据的键，其他实例的数据加上实例标识
+        """
+        return f"{key}_{self._instance_key}" if self._instance_key else key
 
     def do_job(self):
-        if self._sync_douban_status:
-            self.sync_douban_status()
+        self.__run_instances("定时任务", lambda engine: engine.__run_instance())
 
-        if self.use_tmdb_score():
-            if self.use_douban_score():
-                self.use_douban_score(fallback_to_tmdb=True)
-            else:
-                self.use_tmdb_score()
-        elif self.use_douban_score():
-            self.use_douban_score(fallback_to_tmdb=False)
+    def __run_instances(self, name: str, func: Callable[["ZvideoAssistant"], Any]):
+        """
+        在各极影视实例上执行操作：只有一个实例时直接执行；多个实例时并发执行，
+        共用评分缓存、查询结果及请求层（限速及熔断），单个实例失败（如数据库被锁定）不影响其他实例，全部结束后再报告失败
+        :param name: 运行名称
+        :param func: 在实例上执行的操作
+        """
+        if not self._instances:
+            func(self)
+            return
+        job = self._jobs.current()
 
-    def set_douban_watching(self):
-        watching_douban_id = []
-        try:
-            # 连接到SQLite数据库
-            conn = sqlite3.connect(self._db_path)
+        def run(engine: "ZvideoAssistant") -> Optional[str]:
+            with self._jobs.bind(job):
+                try:
+                    func(engine)
+                except JobCancelledError:
+                    pass
+                except Exception as e:
+                    logger.error(f"极影视实例 {engine._db_path} 运行失败：{e}")
+                    return f"{engine._db_path}：{e}"
+            return None
 
-            # 创建一个游标对象
-            cursor = conn.cursor()
+        with self.__record_run(name):
+            self._shared_lookups = {}
+            try:
+                engines = [self] + [self.__instance_engine(instance) for instance in self._instances]
+                with ThreadPoolExecutor(max_workers=len(engines),
+                                        thread_name_prefix="zvideoassistant-instance") as executor:
+                    errors = [error for error in executor.map(run, engines) if error]
+                # 保留各实例已登录的豆瓣助手
+                for engine, instance in zip(engines[1:], self._instances):
+                    instance["_douban_helper"] = engine._douban_helper
+            finally:
+                self._shared_lookups = None
+                for instance in self._instances:
+                    instance["_db"].metrics = None
+        self._jobs.check_cancelled()
+        if errors:
+            raise RuntimeError("；".join(errors))
 
-            # 查询表格zvideo_playlist中的collection_id列
-            cursor.execute("SELECT collection_id FROM zvideo_playlist")
-            collection_ids = cursor.fetchall()
+    def __instance_engine(self, instance: Dict[str, Any]) -> "ZvideoAssistant":
+        """
+        其他实例的插件副本：共用配置、请求层、评分缓存及任务队列，数据库、本地存储、处理状态及豆瓣账号为该实例所有
+        """
+        engine = copy.copy(self)
+        engine.__dict__.update(instance)
+        engine._db.metrics = self._metrics
+        return engine
 
-            # 去重collection_id
-            collection_ids = set([collection_id[0] for collection_id in collection_ids])
+    def __run_instance(self):
+        # 数据库文件及配置均无变化，没有到期需要重试的记录，且上次评分更新未中断时，直接跳过
+        fingerprint = self.__db_fingerprint()
+        # 影响写入结果的配置，变化后需重新运行（如调整评分优先级后重新写回score）
+        options = [self._sync_douban_status, self._use_douban_score, self._use_tmdb_score, self._use_imdb_score,
+                   self._refresh_stale_score, self._score_priority, self._imdb_path, self._collection_score]
+        next_retry = self.__next_retry()
+        if self._scan_state.get("fingerprint") == fingerprint \
+                and self._scan_state.get("options") == options \
+                and (next_retry is None or next_retry > time.time()) \
+                and not self._scan_state.get("score_checkpoint") \
+                and not (self._use_imdb_score and self._imdb and self._imdb.is_stale()):
+            logger.info("极影视数据库无变化，跳过本次运行")
+            return
 
-            # 创建一个列表来保存符合条件的meta_info列的JSON对象
-            meta_info_list = []
+        status_error = None
+        with self.__record_run("定时任务"):
+            if self._sync_douban_status:
+                try:
+                    self.sync_douban_status()
+                except JobCancelledError:
+                    raise
+                except Exception as e:
+                    # 观影状态同步失败（如豆瓣登录失效）不影响评分更新
+                    logger.error(f"同步观影状态失败：{e}")
+                    status_error = e
 
-            # 查询zvideo_collection表中对应的行并筛选type == 200的记录，只有电视剧才有在看状态
-            for collection_id in collection_ids:
-                cursor.execute(
-                    "SELECT meta_info FROM zvideo_collection WHERE collection_id = ? AND type = 200",
-                    (collection_id,),
-                )
-                rows = cursor.fetchall()
+            # 单次扫描完成评分的获取与写回
+            self.update_scores(use_douban=self._use_douban_score, use_tmdb=self._use_tmdb_score,
+                               use_imdb=self._use_imdb_score, budgeted=True)
 
-                # 将meta_info列的信息转换为JSON对象并保存到列表中
-                for row in rows:
-                    try:
-                        meta_info_json = json.loads(row[0])
-                        meta_info_list.append(meta_info_json)
-                    except json.JSONDecodeError as e:
-                        logger.error(
-                            f"An error occurred while decoding JSON for collection_id {collection_id}: {e}"
-                        )
-
-            for meta_info in meta_info_list:
-                douban_id = meta_info["relation"]["douban"]["douban_id"]
-                title = meta_info["title"]
-                if self._cached_data.get(title) != None:
-                    logger.info(f"已处理过: {title}，跳过...")
-                    continue
-                if douban_id != None:
-                    watching_douban_id.append((title, douban_id))
-                else:
-                    logger.error(f"未找到豆瓣ID: {title}")
+            if self._refresh_stale_score \
+                    and time.time() - self._scan_state.get("refresh_at", 0) >= self._refresh_interval:
+                self.refresh_stale_scores()
 
-        except sqlite3.Error as e:
-            logger.error(f"An error occurred: {e}")
+        if status_error:
+            # 不记录数据库状态，下次运行重新同步观影状态，任务报告失败
+            raise RuntimeError(f"同步观影状态失败：{status_error}")
+        # 记录扫描开始前的数据库状态：运行期间极影视的写入不会被当作已处理；
+        # 本次写入同样会使下次运行执行一次，该次没有需要写入的内容，之后数据库无变化时即可跳过
+        self._scan_state["fingerprint"] = fingerprint
+        self._scan_state["options"] = options
+        self.save_data(self.__data_key("scan_state"), self._scan_state)
 
+    @contextmanager
+    def __record_run(self, name: str):
+        """
+        记录一次运行的指标，嵌套调用时计入最外层的运行
+        :param name: 运行名称
+        """
+        if self._metrics:
+            yield self._metrics
+            return
+        metrics = RunMetrics(name)
+        if self._profile:
+            metrics.profiler = RunProfiler(name)
+            metrics.profiler.start()
+        self.__attach_metrics(metrics)
+        try:
+            yield metrics
         finally:
-            # 确保游标和连接在使用完后关闭
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
-            message = ""
-            for item in watching_douban_id:
-                status = DoubanStatus.WATCHING.value
-                ret = self._douban_helper.set_watching_status(
-                    subject_id=item[1], status=status, private=True
-                )
-                if ret:
-                    self._cached_data[item[0]] = status
-                    logger.info(f"title: {item[0]}, douban_id: {item[1]}，已标记为在看")
-                    message += f"{item[0]}，已标记为在看\n"
-                else:
-                    logger.error(
-                        f"title: {item[0]}, douban_id: {item[1]}，标记在看失败"
-                    )
-                    message += f"{item[0]}，***标记在看失败***\n"
-            if self._notify and len(message) > 0:
-                self.post_message(
-                    mtype=NotificationType.SiteMessage,
-                    title="【极影视助手】",
-                    text=message,
-                )
+            self.__attach_metrics(None)
+            history = self.get_data("metrics") or []
+            history.append(metrics.finish())
+            self.save_data("metrics", history[-self._metrics_history_size:])
+            if metrics.profiler:
+                self.__save_profile(metrics.profiler.stop(), metrics=history[-1])
 
-    def set_douban_done(self):
-        watching_douban_id = []
-        try:
-            # 连接到SQLite数据库
-            conn = sqlite3.connect(self._db_path)
+    def __save_profile(self, report: Dict[str, Any], metrics: Dict[str, Any]):
+        """
+        保存性能剖析报告到插件数据目录，只保留最近的若干个
+        :param metrics: 同一次运行的指标
+        """
+        job = self._jobs.current() if self._jobs else None
+        report["job_id"] = job.id if job else None
+        report["metrics"] = metrics
+        profile_dir = self.get_data_path() / "profiles"
+        profile_dir.mkdir(parents=True, exist_ok=True)
+        path = profile_dir / f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(report['started_at']))}" \
+                             f"-{job.id if job else 'run'}.json"
+        path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        logger.info(f"性能剖析报告已保存：{path}")
+        for expired in sorted(profile_dir.glob("*.json"))[:-self._profile_history_size]:
+            expired.unlink(missing_ok=True)
 
-            # 创建一个游标对象
-            cursor = conn.cursor()
+    @contextmanager
+    def __span(self, kind: str):
+        """
+        开启性能剖析时统计代码块的耗时
+        """
+        profiler = self._metrics.profiler if self._metrics else None
+        if not profiler:
+            yield
+            return
+        with profiler.span(kind):
+            yield
 
-            # 通过表格`zvideo_collecion_tags`的`tag_name==是否看过`找到对应的`collcetion_id`，在到`zvideo_collection`中查找将其标记为已看
-            cursor.execute(
-                "SELECT collection_id FROM zvideo_collection_tags WHERE tag_name='是否看过'"
-            )
-            collection_ids = cursor.fetchall()
+    def get_profiles(self) -> Dict[str, Any]:
+        """
+        API：已保存的性能剖析报告
+        """
+        profile_dir = self.get_data_path() / "profiles"
+        profiles = []
+        for path in sorted(profile_dir.glob("*.json"), reverse=True) if profile_dir.exists() else []:
+            try:
+                report = json.loads(path.read_text(encoding="utf-8"))
+            except ValueError:
+                continue
+            profiles.append({"file": path.name, "name": report.get("name"), "job_id": report.get("job_id"),
+                             "started_at": report.get("started_at"), "duration": report.get("duration")})
+        return {"success": True, "data": profiles}
 
-            # 去重collection_id
-            collection_ids = set([collection_id[0] for collection_id in collection_ids])
+    def download_profile(self, file: str):
+        """
+        API：下载性能剖析报告
+        :param file: 报告文件名，见get_profiles
+        """
+        profile_dir = self.get_data_path() / "profiles"
+        path = profile_dir / Path(file or "").name
+        if not file or path.name != file or path.suffix != ".json" or not path.is_file():
+            return {"success": False, "message": f"性能剖析报告不存在：{file}"}
+        return FileResponse(path, media_type="application/json", filename=path.name)
 
-            # 创建一个列表来保存符合条件的meta_info列的JSON对象
-            meta_info_list = []
+    def __attach_metrics(self, metrics: Optional[RunMetrics]):
+        self._metrics = metrics
+        for client in (self._douban_client, self._douban_web_client, self._tmdb_client):
+            if client:
+                client.metrics = metrics
+        if self._db:
+            self._db.metrics = metrics
 
-            for collection_id in collection_ids:
-                cursor.execute(
-                    "SELECT meta_info FROM zvideo_collection WHERE collection_id = ?",
-                    (collection_id,),
-                )
-                rows = cursor.fetchall()
+    def __count(self, key: str, value: int = 1):
+        if self._metrics:
+            self._metrics.incr(key, value)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        API：当前运行及最近运行的指标
+        """
+        return {
+            "current": self._metrics.snapshot() if self._metrics else None,
+            "history": self.get_data("metrics") or [],
+        }
+
+    def __db_fingerprint(self) -> List[list]:
+        """
+        数据库文件及其-wal文件的修改时间和大小，WAL模式下写入先落在-wal文件中
+        """
+        fingerprint = []
+        for suffix in ("", "-wal"):
+            path = Path(f"{self._db_path}{suffix}")
+            if path.exists():
+                stat = path.stat()
+                fingerprint.append([suffix, stat.st_mtime_ns, stat.st_size])
+        return fingerprint
+
+    def __next_retry(self) -> Optional[float]:
+        """
+        失败记录中最早的重试时间
+        """
+        retry_times = [self._store.get_next_retry()]
+        if self._refresh_stale_score:
+            retry_times.append(self._scan_state.get("refresh_at", 0) + self._refresh_interval)
+        for key in ("playlist_pending", "tags_pending"):
+            retry_times.extend((self._scan_state.get(key) or {}).values())
+        retry_times = [retry_at for retry_at in retry_times if retry_at]
+        return min(retry_times) if retry_times else None
+
+    def set_douban_watching(self):
+        # 查询表格zvideo_playlist中的collection_id，只有电视剧才有在看状态
+        self.__sync_status_to_douban(
+            status=DoubanStatus.WATCHING,
+            source_sql="SELECT rowid, collection_id FROM zvideo_playlist "
+                       "WHERE rowid > ? ORDER BY rowid LIMIT ?",
+            state_key="playlist",
+            tv_only=True,
+        )
 
-                # 将meta_info列的信息转换为JSON对象并保存到列表中
-                for row in rows:
+    def set_douban_done(self):
+        # 通过表格`zvideo_collecion_tags`的`tag_name==是否看过`找到对应的`collcetion_id`，在到`zvideo_collection`中查找将其标记为已看
+        self.__sync_status_to_douban(
+            status=DoubanStatus.DONE,
+            source_sql="SELECT rowid, collection_id FROM zvideo_collection_tags "
+                       "WHERE tag_name='是否看过' AND rowid > ? ORDER BY rowid LIMIT ?",
+            state_key="tags",
+            tv_only=False,
+        )
+
+    def __sync_status_to_douban(self, status: DoubanStatus, source_sql: str, state_key: str, tv_only: bool):
+        """
+        只处理rowid大于上次记录位置的新增行，以及此前标记失败且已到重试时间的collection
+        按页读取、同步并保存进度，内存占用与页大小相关
+        """
+        label = "在看" if status == DoubanStatus.WATCHING else "已看"
+        pending = dict(self._scan_state.get(f"{state_key}_pending") or {})
+        now = time.time()
+        retry_ids = [collection_id for collection_id, retry_at in pending.items() if retry_at <= now]
+        summary = self.__new_summary()
+        processed = 0
+        try:
+            with self._db.reader() as conn:
+                # 新增行按rowid分页，到期的失败记录作为最后一批
+                batches = ((list(dict.fromkeys(row[1] for row in rows)), rows[-1][0]) for rows in
+                           self._db.iter_chunks(conn, source_sql,
+                                                start_key=self._scan_state.get(f"{state_key}_rowid", 0)))
+                if retry_ids:
+                    batches = chain(batches, [(retry_ids, None)])
+                for collection_ids, high_water_mark in batches:
+                    items, unresolved = self.__read_status_items(conn, collection_ids, tv_only=tv_only)
+                    # 本批处理过的collection先移出待重试列表，失败的重新加入
                     try:
-                        meta_info_json = json.loads(row[0])
-                        meta_info_list.append(meta_info_json)
-                    except json.JSONDecodeError as e:
-                        logger.error(
-                            f"An error occurred while decoding JSON for collection_id {collection_id}: {e}"
-                        )
-
-            for meta_info in meta_info_list:
-                douban_id = meta_info["relation"]["douban"]["douban_id"]
-                title = meta_info["title"]
-                if self._cached_data.get(title) == DoubanStatus.DONE.value:
-                    logger.info(f"已处理过: {title}，跳过...")
-                    continue
-                if douban_id != None:
-                    watching_douban_id.append((title, douban_id))
-                else:
-                    logger.error(f"未找到豆瓣ID: {title}")
+                        failed = self.__post_statuses(items, status=status, label=label, summary=summary)
+                    except CircuitOpenError:
+                        # 创建豆瓣助手时获取ck已熔断，本批及之后的条目留到下次运行
+                        logger.error(f"豆瓣请求已熔断，跳过本次同步{label}状态")
+                        pending.update({collection_id: now for collection_id in collection_ids})
+                        self._scan_state[f"{state_key}_pending"] = pending
+                        break
+                    for collection_id in collection_ids:
+                        pending.pop(collection_id, None)
+                    pending.update(failed)
+                    # 暂无豆瓣id的collection留在待重试列表中，避免越过高水位后丢失；
+                    # 重试时间记为0：下次实际运行时（极影视刮削后数据库会变化）重新检查，但不单独触发运行
+                    pending.update({collection_id: 0 for collection_id in unresolved})
+                    if high_water_mark is not None:
+                        self._scan_state[f"{state_key}_rowid"] = high_water_mark
+                    self._scan_state[f"{state_key}_pending"] = pending
+                    processed += len(collection_ids)
+                    self.__check_job(f"同步{label}：已处理 {processed} 条")
 
         except sqlite3.Error as e:
             logger.error(f"An error occurred: {e}")
 
-        finally:
-            # 确保游标和连接在使用完后关闭
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
-            message = ""
-            for item in watching_douban_id:
-                status = DoubanStatus.DONE.value
-                ret = self._douban_helper.set_watching_status(
-                    subject_id=item[1], status=status, private=True
-                )
-                if ret:
-                    self._cached_data[item[0]] = status
-                    logger.info(f"title: {item[0]}, douban_id: {item[1]},已标记为已看")
-                    message += f"{item[0]}，已标记为已看\n"
+        self.__post_summary(summary)
+
+    def __read_status_items(self, conn: sqlite3.Connection, collection_ids: List[str],
+                            tv_only: bool) -> Tuple[List[Tuple[str, str, str]], List[str]]:
+        """
+        批量读取collection的标题及豆瓣id
+        :param tv_only: 只同步电视剧，类型已确定为电影的collection直接忽略
+        :return: [(collection_id, title, douban_id)]，以及极影视尚未刮削（无豆瓣id或类型未知）需稍后重试的collection_id
+        """
+        items = []
+        unresolved = []
+        for i in range(0, len(collection_ids), self._db.write_chunk_size):
+            chunk = collection_ids[i:i + self._db.write_chunk_size]
+            sql = f"""
+                SELECT collection_id,
+                       JSON_EXTRACT(meta_info, '$.title'),
+                       JSON_EXTRACT(meta_info, '$.relation.douban.douban_id'),
+                       type
+                FROM zvideo_collection
+                WHERE collection_id IN ({", ".join("?" * len(chunk))}) AND JSON_VALID(meta_info)
+                """
+            with self._db.timer():
+                rows = {row[0]: row[1:] for row in conn.execute(sql, chunk).fetchall()}
+            for collection_id in chunk:
+                if collection_id not in rows:
+                    unresolved.append(collection_id)
+                    continue
+                title, douban_id, media_type = rows[collection_id]
+                if tv_only and media_type != 200:
+                    if media_type not in (100, 200):
+                        unresolved.append(collection_id)
+                    continue
+                if douban_id != None:
+                    items.append((collection_id, title, str(douban_id)))
                 else:
-                    logger.error(
-                        f"title: {item[0]}, douban_id: {item[1]}, 标记已看失败"
-                    )
-                    message += f"{item[0]}，***标记已看失败***\n"
-            if self._notify and len(message) > 0:
-                self.post_message(
-                    mtype=NotificationType.SiteMessage,
-                    title="【极影视助手】",
-                    text=message,
-                )
+                    logger.error(f"未找到豆瓣ID: {title}，下次运行重试")
+                    unresolved.append(collection_id)
+        return items, unresolved
 
-    # 填充zvideo_collection中所有行的douban_score
-    def fill_douban_score(self, fallback_to_tmdb: bool = False):
-        logger.info("获取豆瓣评分...")
-        conn = sqlite3.connect(self._db_path)
-        # 使用UTF-8编码处理文本
-        conn.text_factory = str
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT id, extend_type, meta_info FROM zvideo_collection")
-        rows = cursor.fetchall()
-        message = ""
-        for row in rows:
-            rowid, extend_type, meta_info_json = row
-            # 合集，不处理
-            if extend_type == 7:
+    def __post_statuses(self, items: List[Tuple[str, str, str]], status: DoubanStatus,
+                        label: str, summary: dict) -> Dict[str, float]:
+        """
+        同步一批条目的观影状态
+        :return: 失败待重试的 {collection_id: 重试时间}
+        """
+        now = time.time()
+        failed = {}
+        to_sync = self.__status_delta(items, status)
+        # 仍有待同步的条目时，先获取豆瓣上已有的标记，只提交状态确实不同的条目
+        if to_sync and self.__refresh_douban_snapshot():
+            to_sync = self.__status_delta(to_sync, status)
+
+        if not to_sync:
+            return failed
+        helper = self.__get_douban_helper()
+        job = self._jobs.current()
+        circuit_open = threading.Event()
+
+        def post(item: Tuple[str, str, str]) -> Optional[bool]:
+            # 任务已取消或豆瓣已熔断时不再提交，返回None
+            if circuit_open.is_set() or (job and job.cancelled):
+                return None
+            try:
+                return helper.set_watching_status(subject_id=item[2], status=status.value, private=True)
+            except CircuitOpenError:
+                circuit_open.set()
+                return None
+
+        synced_statuses = []
+        skipped = 0
+        # 同一豆瓣条目（同一影片的多个版本）只提交一次，结果应用到所有对应的collection
+        subjects = list({item[2]: item for item in to_sync}.values())
+        # 有界线程池并发提交，请求间隔仍由豆瓣ClientHelper统一限速
+        with ThreadPoolExecutor(max_workers=self._status_workers,
+                                thread_name_prefix="zvideoassistant-douban") as executor:
+            posted = dict(zip((item[2] for item in subjects), executor.map(post, subjects)))
+        reported = set()
+        for collection_id, title, douban_id in to_sync:
+            ret = posted[douban_id]
+            if ret is None:
+                # 未提交的条目留到下次运行
+                skipped += 1
+                failed[collection_id] = now
                 continue
-            meta_info_dict = json.loads(meta_info_json)
-            # 如果meta_info为空，跳过
-            if meta_info_dict.get("douban_score") == None:
+            if not ret:
+                failed[collection_id] = now + self._retry_interval
+            if douban_id in reported:
                 continue
-            if meta_info_dict["douban_score"] == 0:
-                douban_id = meta_info_dict["relation"]["douban"]["douban_id"]
-                title = meta_info_dict["title"]
-                score = self._score_helper.get_douban_score(douban_id=douban_id, title=title)
-                if score:
-                    meta_info_dict["douban_score"] = score
-                    logger.info(f"更新豆瓣评分：{title} {score}")
-                    message += f"{title} 更新豆瓣评分：{score}\n"
-                else:
-                    if fallback_to_tmdb:
-                        logger.info(f"未找到豆瓣评分：{title} {douban_id},启用tmdb评分")
-                        meta_info_dict = self.fallback_to_use_tmdb(meta_info_dict, message)
-                    else:
-                        logger.debug(f"未找到豆瓣评分：{title} {douban_id}")
-                        continue
+            reported.add(douban_id)
+            if ret:
+                self.__count("statuses_synced")
+                synced_statuses.append((douban_id, status.value))
+                logger.info(f"title: {title}, douban_id: {douban_id}，已标记为{label}")
+                self.__add_summary(summary, f"{title}，已标记为{label}")
             else:
-                logger.info(
-                    f"已存在豆瓣评分：{meta_info_dict['title']} {meta_info_dict['douban_score']}"
+                self.__count("statuses_failed")
+                logger.error(
+                    f"title: {title}, douban_id: {douban_id}，标记{label}失败"
                 )
+                self.__add_summary(summary, f"{title}，***标记{label}失败***")
+        if skipped:
+            logger.error(f"{'豆瓣请求已熔断' if circuit_open.is_set() else '任务已取消'}，"
+                         f"剩余 {skipped} 条待下次运行同步")
+        # 只写入本次变更的状态
+        self._store.save_statuses(synced_statuses)
+        return failed
+
+    def __new_summary(self) -> dict:
+        return {"lines": [], "total": 0}
+
+    def __add_summary(self, summary: dict, line: str):
+        """
+        通知只保留前若干条明细，其余只计数
+        """
+        summary["total"] += 1
+        if len(summary["lines"]) < self._message_limit:
+            summary["lines"].append(line)
+
+    def __post_summary(self, summary: dict):
+        if not self._notify or not summary["total"]:
+            return
+        text = "\n".join(summary["lines"])
+        if summary["total"] > len(summary["lines"]):
+            text += f"\n...等共 {summary['total']} 条"
+        self.post_message(
+            mtype=NotificationType.SiteMessage,
+            title="【极影视助手】",
+            text=text,
+        )
+
+    def __status_delta(self, items: List[Tuple[str, str, str]], status: DoubanStatus) -> List[Tuple[str, str, str]]:
+        """
+        过滤掉豆瓣上已是目标状态的条目
+        在看：已有任何标记即跳过；已看：已标记为已看才跳过
+        """
+        known_statuses = self._store.get_statuses(item[2] for item in items)
+        delta = []
+        for item in items:
+            known_status = known_statuses.get(item[2])
+            if known_status is not None and (status == DoubanStatus.WATCHING or known_status == status.value):
                 continue
+            delta.append(item)
+        skipped = len(items) - len(delta)
+        self.__count("cache_lookups", len(items))
+        self.__count("cache_hits", skipped)
+        if skipped:
+            logger.info(f"已处理过 {skipped} 条，跳过...")
+        return delta
 
-            # 使用ensure_ascii=False来保持中文字符不变
-            updated_meta_info_json = json.dumps(meta_info_dict, ensure_ascii=False)
-            cursor.execute(
-                "UPDATE zvideo_collection SET meta_info = ? WHERE id = ?",
-                (updated_meta_info_json, rowid),
-            )
-            conn.commit()
-        if self._notify and len(message) > 0:
-            self.post_message(
-                mtype=NotificationType.SiteMessage,
-                title="【极影视助手】",
-                text=message,
-            )
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
+    def __refresh_douban_snapshot(self) -> bool:
+        """
+        分页获取用户在豆瓣上的在看/看过列表并写入本地状态，快照在有效期内不重复获取
+        :return: 本次是否获取了新的快照
+        """
+        if time.time() - self._scan_state.get("douban_snapshot_at", 0) < self._snapshot_ttl:
+            return False
+        snapshot = []
+        # 先写入在看，再写入看过，同一条目以看过为准
+        for status in (DoubanStatus.WATCHING, DoubanStatus.DONE):
+            try:
+                subject_ids = self.__get_douban_helper().get_interest_subjects(status.value)
+            except CircuitOpenError:
+                return False
+            if subject_ids is None:
+                return False
+            snapshot.extend((subject_id, status.value) for subject_id in subject_ids)
+        self._store.save_statuses(list(dict(snapshot).items()))
+        self._scan_state["douban_snapshot_at"] = time.time()
+        logger.info(f"已获取豆瓣标记快照，共 {len(snapshot)} 条")
+        return True
 
     def use_douban_score(self, fallback_to_tmdb: bool = False):
         logger.info("使用豆瓣评分...")
-        self.fill_douban_score(fallback_to_tmdb)
-        conn = sqlite3.connect(self._db_path)
-        cursor = conn.cursor()
-        # 将meta_info的douban_score值同步到zvideo_collection表的score列
-        cursor.execute(
-            """
-            UPDATE zvideo_collection
-            SET meta_info = JSON_SET(meta_info, '$.score', CAST(JSON_EXTRACT(meta_info, '$.douban_score') AS JSON))
-            WHERE CAST(JSON_EXTRACT(meta_info, '$.douban_score') AS DECIMAL(3,1)) <> 0.0
-            """
-        )
-        conn.commit()
-
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
+        with self.__record_run("使用豆瓣评分"):
+            self.update_scores(use_douban=True, use_tmdb=fallback_to_tmdb)
         logger.info("更新极影视为豆瓣评分...")
 
-    def fallback_to_use_tmdb(self, meta_info_dict: Dict, message: str) -> Dict:
-        if meta_info_dict.get("custom_tmdb_score") == None:
-            tmdb_id = meta_info_dict["relation"]["tmdb"]["tmdb_id"]
-            title = meta_info_dict["title"]
-            type = meta_info_dict["type"]
-            # 100代表电影，200代表电视剧
-            tmdb_info = {}
-            if type == 100:
-                tmdb_info = self.tmdb.get_info(mtype=MediaType.MOVIE, tmdbid=tmdb_id)
-            elif type == 200:
-                tmdb_info = self.tmdb.get_info(mtype=MediaType.TV, tmdbid=tmdb_id)
-            else:
-                logger.error(f"未知type类型：title={title} tmdbid={tmdb_id} type={type}")
-                return meta_info_dict
+    def use_tmdb_score(self):
+        logger.info("使用tmdb评分...")
+        with self.__record_run("使用tmdb评分"):
+            self.update_scores(use_douban=False, use_tmdb=True)
+        logger.info("更新极影视为tmdb评分...")
+
+    def use_imdb_score(self):
+        logger.info("使用IMDb评分...")
+        with self.__record_run("使用IMDb评分"):
+            self.update_scores(use_douban=False, use_tmdb=False, use_imdb=True)
+        logger.info("更新极影视为IMDb评分...")
 
-            if tmdb_info.get("vote_average") == None:
-                logger.error(f"未找到tmdb评分，tmdb_info={tmdb_info}")
-                return meta_info_dict
+    def update_scores(self, use_douban: bool, use_tmdb: bool, use_imdb: bool = False, budgeted: bool = False):
+        """
+        补全各来源的评分后，按优先级（豆瓣、tmdb、IMDb）将首个有效评分同步到score
+        :param budgeted: 获取评分是否受单次运行的预算限制，定时任务使用
+        """
+        if not use_douban and not use_tmdb and not use_imdb:
+            return
+        logger.info(f"更新评分：豆瓣={use_douban} tmdb={use_tmdb} IMDb={use_imdb}")
+        summary = self.__new_summary()
+        if use_imdb:
+            self.__update_imdb_scores()
+        if use_douban or use_tmdb:
+            # 先用缓存中的评分补全，缓存未命中的行再请求接口
+            self.__fill_cached_scores()
+            self.__fetch_scores(use_douban=use_douban, use_tmdb=use_tmdb, summary=summary, budgeted=budgeted)
+        # 将选定来源的评分同步到score
+        applied = self.__apply_scores(use_douban=use_douban, use_tmdb=use_tmdb, use_imdb=use_imdb)
+        logger.info(f"评分更新完成，共更新 {applied} 条记录的score")
+        self.__post_summary(summary)
+
+    def __fetch_scores(self, use_douban: bool, use_tmdb: bool, summary: dict, budgeted: bool = False):
+        """
+        单次扫描zvideo_collection，为每行确定评分来源（豆瓣、豆瓣无评分时回退tmdb、仅tmdb），
+        补全缺失的评分后统一写回。仅处理评分摘要与上次不同的新增或变更行
+        按页读取，每页待获取评分的行分小批获取并写回，同时保存检查点（扫描位置及待获取队列），
+        运行中断后下次从检查点继续，已获取的评分不再重复请求
+        在看及最近新增的影片优先处理，受预算限制时积压的行在之后的运行中逐步处理
+        :param budgeted: 是否受单次运行的请求数及时长预算限制
+        """
+        providers = [self._providers[source] for source in self.__score_chain(use_douban, use_tmdb)]
+        options = [use_douban, use_tmdb]
+        # 在线来源的优先级不是默认顺序时才记录，默认顺序时与之前记录的选项保持一致
+        order = [provider.source for provider in providers]
+        if order != [source for source in self._score_sources if source in order]:
+            options.append(",".join(order))
+        # 评分来源变化后，此前记录的摘要及检查点失效
+        if self._scan_state.get("score_options") != options:
+            self._store.clear_digests()
+            self._scan_state["score_options"] = options
+            self._scan_state.pop("score_checkpoint", None)
+            self.save_data(self.__data_key("scan_state"), self._scan_state)
+
+        run = {
+            # 按优先级排列的在线评分来源
+            "providers": providers,
+            "summary": summary,
+            "now": time.time(),
+            "candidates": 0,
+            "filled": 0,
+            # 已有评分的行只计数，不逐行输出日志
+            "existing": {provider.source: 0 for provider in self._providers.values()},
+            # 本次运行已查询过的外部id，同一影片的多个版本（及多实例中的同一影片）只请求一次
+            "lookups": self._shared_lookups if self._shared_lookups is not None else {},
+            # 预算：截止时间及请求数上限，不限制时为None
+            "deadline": self.__score_deadline() if budgeted else None,
+            "request_limit": self._score_limit if budgeted and self._score_limit > 0 else None,
+            "requests_start": self.__request_count(),
+            "exhausted": False,
+            # 已熔断的评分来源名称，熔断后停止获取评分
+            "circuit_open": None,
+            # 本次运行已作为优先行处理的id，之后的队列及区间扫描中跳过
+            "handled": set(),
+            # 发起运行的任务，供查询线程判断是否已取消
+            "job": self._jobs.current(),
+        }
+        run["stop"] = lambda: self.__should_stop(run)
+        checkpoint = self._scan_state.get("score_checkpoint")
+        with self._db.reader() as conn:
+            with self._db.timer():
+                max_id = conn.execute("SELECT MAX(id) FROM zvideo_collection").fetchone()[0] or 0
+            if checkpoint:
+                # 先处理中断时的待获取队列，再从中断位置扫描到末尾，最后补扫开头到中断位置
+                logger.info(f"从检查点继续更新评分：id {checkpoint['last_id']}，"
+                            f"待获取 {len(checkpoint['pending'])} 条")
+                ranges = [(checkpoint["last_id"], 2 ** 63 - 1), (-2 ** 63, checkpoint["last_id"])]
             else:
-                score = tmdb_info["vote_average"]
-                meta_info_dict["custom_tmdb_score"] = score
-                logger.info(f"更新tmdb评分：{title} {score}")
-                message += f"{title} 更新tmdb评分：{score}\n"
-        else:
-            logger.info(f"已存在tmdb评分：{meta_info_dict['title']} {meta_info_dict['custom_tmdb_score']}")
-        return meta_info_dict
-
-    def fill_tmdb_score(self):
-        logger.info("获取tmdb评分...")
-        conn = sqlite3.connect(self._db_path)
-        # 使用UTF-8编码处理文本
-        conn.text_factory = str
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT id, extend_type, meta_info FROM zvideo_collection")
-        rows = cursor.fetchall()
-        message = ""
-        for row in rows:
-            rowid, extend_type, meta_info_json = row
+                checkpoint = {"last_id": -2 ** 63, "pending": []}
+                ranges = [(-2 ** 63, 2 ** 63 - 1)]
+            batches = chain(
+                self.__priority_score_rows(conn, handled=run["handled"]),
+                self.__pending_score_rows(conn, checkpoint),
+                *(self.__range_score_rows(conn, start_id, end_id, max_id) for start_id, end_id in ranges),
+            )
+            for rows, last_id, message, progress in batches:
+                rows = [row for row in rows if row[0] not in run["handled"]]
+                self.__process_score_rows(rows, checkpoint=checkpoint, run=run, last_id=last_id)
+                if run["circuit_open"]:
+                    logger.error(f"{run['circuit_open']}请求已熔断，停止获取评分，剩余部分下次继续，"
+                                 f"待获取 {len(checkpoint['pending'])} 条，已扫描至id {checkpoint['last_id']}")
+                    self.__save_checkpoint(checkpoint)
+                    break
+                if run["exhausted"]:
+                    logger.info(f"已达到本次运行的评分补全预算，剩余部分下次继续，"
+                                f"待获取 {len(checkpoint['pending'])} 条，已扫描至id {checkpoint['last_id']}")
+                    self.__save_checkpoint(checkpoint)
+                    break
+                self.__check_job(message, progress)
+            else:
+                # 完整扫描结束，清除检查点
+                if self._scan_state.pop("score_checkpoint", None) is not None:
+                    self.save_data(self.__data_key("scan_state"), self._scan_state)
+
+        existing = run["existing"]
+        self.__count("douban_score_exists", existing["douban"])
+        self.__count("tmdb_score_exists", existing["tmdb"])
+        logger.info(f"共 {run['candidates']} 条新增或变更记录已处理，补全 {run['filled']} 项评分，"
+                    f"其中已存在豆瓣评分 {existing['douban']} 条，已存在tmdb评分 {existing['tmdb']} 条")
+
+    def __score_rows_sql(self, where: str) -> str:
+        # 只在数据库中提取评分相关字段，不在Python中解析完整的meta_info
+        return f"""
+               SELECT id, extend_type,
+                      CASE WHEN JSON_VALID(meta_info) THEN JSON_EXTRACT(meta_info, {", ".join("?" * len(self._score_fields))}) END
+               FROM zvideo_collection
+               WHERE {where}
+               """
+
+    def __priority_score_rows(self, conn: sqlite3.Connection,
+                              handled: set) -> Iterator[Tuple[List[tuple], None, str, None]]:
+        """
+        优先处理的行：zvideo_playlist中在看的影片，及id最大的若干条最近新增的影片
+        :param handled: 处理后加入的id集合，之后的扫描中跳过这些行
+        """
+        with self._db.timer():
+            rows = conn.execute(
+                self.__score_rows_sql(
+                    "id IN (SELECT id FROM zvideo_collection ORDER BY id DESC LIMIT ?) "
+                    "OR collection_id IN (SELECT collection_id FROM zvideo_playlist)"
+                ) + " ORDER BY id",
+                [*self._score_fields.values(), self._priority_recent],
+            ).fetchall()
+        for i in range(0, len(rows), self._db.read_chunk_size):
+            chunk = rows[i:i + self._db.read_chunk_size]
+            yield chunk, None, "更新评分：处理在看及新增的影片", None
+            handled.update(row[0] for row in chunk)
+
+    def __pending_score_rows(self, conn: sqlite3.Connection,
+                             checkpoint: dict) -> Iterator[Tuple[List[tuple], None, str, None]]:
+        """
+        检查点中的待获取队列，遍历结束后清空，已删除或已处理过的行不再保留
+        """
+        pending = checkpoint["pending"]
+        for i in range(0, len(pending), self._db.read_chunk_size):
+            chunk = pending[i:i + self._db.read_chunk_size]
+            with self._db.timer():
+                rows = conn.execute(self.__score_rows_sql(f"id IN ({', '.join('?' * len(chunk))})") + " ORDER BY id",
+                                    [*self._score_fields.values(), *chunk]).fetchall()
+            yield rows, None, "更新评分：处理检查点中的待获取队列", None
+        checkpoint["pending"] = []
+
+    def __range_score_rows(self, conn: sqlite3.Connection, start_id: int, end_id: int,
+                           max_id: int) -> Iterator[Tuple[List[tuple], int, str, Optional[float]]]:
+        """
+        按id分页读取(start_id, end_id]区间内的行
+        """
+        for rows in self._db.iter_chunks(conn, self.__score_rows_sql("id <= ? AND id > ?") + " ORDER BY id LIMIT ?",
+                                         params=[*self._score_fields.values(), end_id], start_key=start_id):
+            yield rows, rows[-1][0], f"更新评分：已扫描至id {rows[-1][0]}/{max_id}", \
+                rows[-1][0] / max_id if max_id > 0 else None
+
+    def __score_deadline(self) -> Optional[float]:
+        return time.time() + self._score_minutes * 60 if self._score_minutes > 0 else None
+
+    def __request_count(self) -> int:
+        """
+        豆瓣及TMDB评分接口累计发出的请求数
+        """
+        return sum(client.requests for client in (self._douban_client, self._tmdb_client) if client)
+
+    def __should_stop(self, run: dict) -> bool:
+        """
+        任务已取消、评分来源已熔断或预算已用完，可在查询线程中调用
+        """
+        job = run.get("job")
+        return bool(job and job.cancelled) or bool(run["circuit_open"]) or self.__over_budget(run)
+
+    def __over_budget(self, run: dict) -> bool:
+        if run["deadline"] is not None and time.time() >= run["deadline"]:
+            run["exhausted"] = True
+        elif run["request_limit"] is not None \
+                and self.__request_count() - run["requests_start"] >= run["request_limit"]:
+            run["exhausted"] = True
+        return run["exhausted"]
+
+    def __process_score_rows(self, rows: List[tuple], checkpoint: dict, run: dict, last_id: int = None):
+        """
+        找出一页中摘要变化或到期重试的行，分批获取评分并写回，每批写回后更新检查点
+        :param rows: [(id, extend_type, 评分字段JSON)]，可为空（本页的行均已优先处理）
+        :param checkpoint: 检查点 {"last_id": 已扫描到的id, "pending": 待获取评分的id}
+        :param run: 本次运行的选项及统计
+        :param last_id: 本页最后的id，处理检查点中的待获取队列时为None
+        """
+        digests = self._store.get_digests(row[0] for row in rows)
+        queue = []
+        self.__count("rows_scanned", len(rows))
+        for rowid, extend_type, fields_json in rows:
             # 合集，不处理
-            if extend_type == 7:
+            if extend_type == 7 or not fields_json:
                 continue
-            meta_info_dict = json.loads(meta_info_json)
-            # 如果meta_info为空，跳过
-            if meta_info_dict.get("custom_tmdb_score") == None:
-                tmdb_id = meta_info_dict["relation"]["tmdb"]["tmdb_id"]
-                title = meta_info_dict["title"]
-                type = meta_info_dict["type"]
-                # 100代表电影，200代表电视剧
-                tmdb_info = {}
-                if type == 100:
-                    tmdb_info = self.tmdb.get_info(mtype=MediaType.MOVIE, tmdbid=tmdb_id)
-                elif type == 200:
-                    tmdb_info = self.tmdb.get_info(mtype=MediaType.TV, tmdbid=tmdb_id)
-                else:
-                    logger.error(f"未知type类型：title={title} tmdbid={tmdb_id} type={type}")
-                    continue
-
-                if tmdb_info.get("vote_average") == None:
-                    logger.error(f"未找到tmdb评分，tmdb_info={tmdb_info}")
-                    continue
-                else:
-                    score = tmdb_info["vote_average"]
-                    meta_info_dict["custom_tmdb_score"] = score
-                    logger.info(f"更新tmdb评分：{title} {score}")
-                    message += f"{title} 更新tmdb评分：{score}\n"
-            else:
-                logger.info(f"已存在tmdb评分：{meta_info_dict['title']} {meta_info_dict['custom_tmdb_score']}")
+            with self.__span("json"):
+                fields = dict(zip(self._score_fields, json.loads(fields_json)))
+                digest = self.__score_digest(fields)
+            saved_digest, retry_at = digests.get(rowid, (None, None))
+            self.__count("cache_lookups")
+            if saved_digest == digest and not (retry_at and retry_at <= run["now"]):
+                self.__count("cache_hits")
                 continue
+            queue.append((rowid, fields))
+
+        if last_id is not None:
+            checkpoint["last_id"] = last_id
+            if not queue:
+                return
+            checkpoint["pending"] = [rowid for rowid, _ in queue]
+            self.__save_checkpoint(checkpoint)
 
-            # 使用ensure_ascii=False来保持中文字符不变
-            updated_meta_info_json = json.dumps(meta_info_dict, ensure_ascii=False)
-            cursor.execute(
-                "UPDATE zvideo_collection SET meta_info = ? WHERE id = ?",
-                (updated_meta_info_json, rowid),
+        for i in range(0, len(queue), self._checkpoint_size):
+            # 任务已取消或预算已用完，剩余的行保留在检查点中，下次运行再处理
+            if run["stop"]():
+                return
+            results = self.__plan_scores(queue[i:i + self._checkpoint_size], run=run)
+            run["candidates"] += len(results)
+            self.__count("candidates", len(results))
+            run["filled"] += self.__save_scores(results)
+            done = {result[0] for result in results}
+            checkpoint["pending"] = [rowid for rowid in checkpoint["pending"] if rowid not in done]
+            self.__save_checkpoint(checkpoint)
+
+    def __save_scores(self, results: List[Tuple[int, Dict, set, Optional[float]]]) -> int:
+        """
+        写回一批评分，并保存摘要、评分缓存及获取时间
+        :param results: [(id, 评分字段, 有变更的字段, 重试时间)]
+        :return: 补全的评分项数
+        """
+        if not results:
+            return 0
+        providers = {provider.field: provider for provider in self._providers.values()}
+        updates = {}
+        cached_scores = []
+        fetched_ids = []
+        for rowid, fields, changed, _ in results:
+            for field in changed:
+                updates.setdefault(field, []).append((fields[field], rowid))
+                cached_scores.append((providers[field].source, providers[field].key(fields), fields[field]))
+            if changed:
+                fetched_ids.append(rowid)
+
+        # 在数据库中直接修改评分字段，分批短事务写回，减少对极影视的锁占用
+        filled = 0
+        for field, params in updates.items():
+            filled += self._db.write_many(
+                f"UPDATE zvideo_collection SET meta_info = JSON_SET(meta_info, '$.{field}', ?) "
+                f"WHERE id = ? AND JSON_VALID(meta_info)",
+                params,
             )
-            conn.commit()
-        if self._notify and len(message) > 0:
-            self.post_message(
-                mtype=NotificationType.SiteMessage,
-                title="【极影视助手】",
-                text=message,
+        # 评分获取失败的行在重试间隔后再次处理
+        self._store.save_digests([(rowid, self.__score_digest(fields), retry_at)
+                                  for rowid, fields, _, retry_at in results])
+        self._cache.save_cached_scores([score for score in cached_scores if score[1]])
+        # 记录评分获取时间，已有评分的行记录首次发现时间，供刷新过期评分使用
+        self._store.save_refresh_times(fetched_ids)
+        self._store.save_refresh_times([result[0] for result in results], first_seen=True)
+        return filled
+
+    def __save_checkpoint(self, checkpoint: dict):
+        self._scan_state["score_checkpoint"] = checkpoint
+        self.save_data(self.__data_key("scan_state"), self._scan_state)
+
+    def import_scores(self, path: str):
+        """
+        导入其他工具导出的评分：流式读取并校验，分批写入评分缓存，
+        再按外部id补全meta_info中缺失的评分，全程不请求接口
+        :param path: CSV或JSON lines文件路径，可为.gz压缩
+        """
+        with self.__record_run("导入评分"):
+            importer = ImportHelper(path)
+            batch = []
+            imported = 0
+            for record in importer.records():
+                batch.append(record)
+                if len(batch) >= self._import_batch_size:
+                    self._cache.save_cached_scores(batch)
+                    imported += len(batch)
+                    batch = []
+                    self.__check_job(f"导入评分：已导入 {imported} 条")
+            self._cache.save_cached_scores(batch)
+            imported += len(batch)
+            self.__count("scores_imported", imported)
+            logger.info(f"评分文件读取完成：{dict(importer.stats)}")
+            # 评分缓存为各实例共用，导入一次后在各实例上补全并写回
+            results = []
+            self.__run_instances("导入评分", lambda engine: results.append(engine.__apply_cached_scores()))
+            filled = sum(result[0] for result in results)
+            applied = sum(result[1] for result in results)
+            self._jobs.report(f"导入评分 {imported} 条，补全 {filled} 项评分，更新 {applied} 条记录的score")
+            logger.info(f"导入评分 {imported} 条，补全 {filled} 项评分，更新 {applied} 条记录的score")
+
+    def __apply_cached_scores(self) -> Tuple[int, int]:
+        """
+        用评分缓存补全本实例缺失的评分并写回score
+        :return: 补全的评分项数、更新score的行数
+        """
+        filled = self.__fill_cached_scores()
+        applied = self.__apply_scores(use_douban=self._use_douban_score, use_tmdb=self._use_tmdb_score,
+                                      use_imdb=self._use_imdb_score)
+        return filled, applied
+
+    def __fill_cached_scores(self) -> int:
+        """
+        用评分缓存补全meta_info中缺失的豆瓣（为0）及tmdb评分（不存在），按外部id关联，仅更新缺失的行
+        :return: 实际变更的行数
+        """
+        cached_scores = {
+            provider.field: (f"(SELECT score FROM store.score_cache WHERE source = '{provider.source}' "
+                             f"AND external_id = {provider.cache_key_sql})", provider.missing_sql)
+            for provider in self._providers.values()
+        }
+        filled = 0
+        for field, (cached_score, missing) in cached_scores.items():
+            filled += self._db.write_many(
+                f"""
+                UPDATE zvideo_collection
+                SET meta_info = JSON_SET(meta_info, '$.{field}', {cached_score})
+                WHERE id BETWEEN ? AND ?
+                  AND extend_type IS NOT 7
+                  AND JSON_VALID(meta_info)
+                  AND {missing}
+                  AND {cached_score} IS NOT NULL
+                """,
+                self.__id_ranges(),
+                chunk_size=1,
+                attach={"store": self._cache.db_path},
             )
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
+        if filled:
+            logger.info(f"从评分缓存补全 {filled} 项评分")
+        return filled
 
-    def use_tmdb_score(self):
-        logger.info("使用tmdb评分...")
-        self.fill_tmdb_score()
-        conn = sqlite3.connect(self._db_path)
-        cursor = conn.cursor()
-        # 将meta_info的score值同步到zvideo_collection表的score列
-        cursor.execute(
-            """
+    def __update_imdb_scores(self) -> int:
+        """
+        从本地IMDb评分库补全$.custom_imdb_score，按meta_info中的IMDb id关联，无需请求网络
+        仅更新评分不同的行
+        :return: 实际变更的行数
+        """
+        if not self._imdb or not self._imdb.ensure():
+            return 0
+        imdb_score = ("(SELECT rating FROM imdb.imdb_rating WHERE tconst = "
+                      "CAST(SUBSTR(JSON_EXTRACT(meta_info, '$.relation.imdb.imdb_id'), 3) AS INTEGER))")
+        changed = self._db.write_many(
+            f"""
+            UPDATE zvideo_collection
+            SET meta_info = JSON_SET(meta_info, '$.custom_imdb_score', {imdb_score})
+            WHERE id BETWEEN ? AND ?
+              AND extend_type IS NOT 7
+              AND JSON_VALID(meta_info)
+              AND {imdb_score} IS NOT NULL
+              AND JSON_EXTRACT(meta_info, '$.custom_imdb_score') IS NOT {imdb_score}
+            """,
+            self.__id_ranges(),
+            chunk_size=1,
+            attach={"imdb": self._imdb.db_path},
+        )
+        logger.info(f"IMDb评分更新 {changed} 条")
+        return changed
+
+    def __apply_scores(self, use_douban: bool, use_tmdb: bool, use_imdb: bool = False) -> int:
+        """
+        按优先级将选定来源中首个有效的评分写入$.score，仅更新score与来源评分不同的行，随后更新合集的score
+        :return: 实际变更的行数
+        """
+        sources = [
+            f"NULLIF(JSON_EXTRACT(meta_info, '$.{self._score_sources[source]}'), 0)"
+            for source in self.__score_chain(use_douban, use_tmdb, use_imdb)
+        ]
+        if not sources:
+            return 0
+        source_score = f"COALESCE({', '.join(sources)})" if len(sources) > 1 else sources[0]
+        # 按id区间拆分为多个短事务
+        return self._db.write_many(
+            f"""
             UPDATE zvideo_collection
-            SET meta_info = JSON_SET(meta_info, '$.score', CAST(JSON_EXTRACT(meta_info, '$.custom_tmdb_score') AS JSON))
-            WHERE CAST(JSON_EXTRACT(meta_info, '$.custom_tmdb_score') AS DECIMAL(3,1)) <> 0.0
+            SET meta_info = JSON_SET(meta_info, '$.score', {source_score})
+            WHERE id BETWEEN ? AND ?
+              AND extend_type IS NOT 7
+              AND JSON_VALID(meta_info)
+              AND {source_score} IS NOT NULL
+              AND JSON_EXTRACT(meta_info, '$.score') IS NOT {source_score}
+            """,
+            self.__id_ranges(),
+            chunk_size=1,
+        ) + self.__apply_collection_scores()
+
+    def __apply_collection_scores(self) -> int:
+        """
+        合集（extend_type 7）的score取其成员影片score的平均值，无需请求接口
+        成员取自合集meta_info中的collection_ids，该字段并非所有极影视版本都有，因此需开启"合集评分取成员平均"，
+        且数据库中没有该字段时跳过；没有有效评分的成员不参与计算
+        先在一次查询中聚合全部合集的评分，再分批只更新score有变化的合集
+        :return: 实际变更的行数
+        """
+        if not self._collection_score:
+            return 0
+        with self._db.reader() as conn, self._db.timer():
+            rows = conn.execute(
+                """
+                SELECT box.id, ROUND(AVG(JSON_EXTRACT(member.meta_info, '$.score')), 1),
+                       JSON_EXTRACT(box.meta_info, '$.score')
+                FROM zvideo_collection AS box,
+                     JSON_EACH(box.meta_info, '$.collection_ids') AS ids
+                JOIN zvideo_collection AS member ON member.collection_id = ids.value
+                WHERE box.extend_type = 7
+                  AND JSON_VALID(box.meta_info)
+                  AND member.extend_type IS NOT 7
+                  AND JSON_VALID(member.meta_info)
+                  AND JSON_EXTRACT(member.meta_info, '$.score') > 0
+                GROUP BY box.id
+                """
+            ).fetchall()
+        if not rows:
+            logger.info("合集的meta_info中没有可用的成员列表（collection_ids），跳过合集评分")
+            return 0
+        changed = self._db.write_many(
             """
+            UPDATE zvideo_collection
+            SET meta_info = JSON_SET(meta_info, '$.score', ?)
+            WHERE id = ? AND extend_type = 7 AND JSON_VALID(meta_info)
+            """,
+            ((score, rowid) for rowid, score, current in rows if score != current),
         )
-        conn.commit()
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-        logger.info("更新极影视为tmdb评分...")
+        if changed:
+            logger.info(f"按成员评分更新 {changed} 个合集的score")
+        return changed
+
+    def __id_ranges(self) -> Iterator[Tuple[int, int]]:
+        """
+        按_apply_range将zvideo_collection的id拆分为区间
+        """
+        with self._db.reader() as conn, self._db.timer():
+            min_id, max_id = conn.execute("SELECT MIN(id), MAX(id) FROM zvideo_collection").fetchone()
+        if min_id is None:
+            return
+        for start in range(min_id, max_id + 1, self._apply_range):
+            yield start, start + self._apply_range - 1
+
+    def __score_digest(self, fields: Dict) -> int:
+        return zlib.crc32(json.dumps([fields.get(key) for key in self._digest_fields]).encode("utf-8"))
+
+    def __plan_scores(self, batch: List[Tuple[int, Dict]], run: dict) -> List[Tuple[int, Dict, set, Optional[float]]]:
+        """
+        按评分来源的优先级逐级补全一批行缺失的评分：每一级只为尚无评分的行按外部id批量查询，
+        未找到评分的行回退到下一级来源，获取的评分直接写入fields
+        score由__apply_scores在数据库中统一同步
+        :param batch: [(id, 从meta_info中提取的评分相关字段)]
+        :param run: 本次运行的选项及统计
+        :return: [(id, fields, 有变更的字段, 重试时间)]，重试时间在评分已获取完成时为None；
+                 因任务取消或预算用完未查询完的行不在结果中，保留在检查点
+        """
+        now = time.time()
+        changed = {rowid: set() for rowid, _ in batch}
+        retry_times = {}
+        unfinished = set()
+        unresolved = batch
+        for provider in run["providers"]:
+            to_fetch = []
+            fallback = []
+            for rowid, fields in unresolved:
+                if not provider.applicable(fields):
+                    fallback.append((rowid, fields))
+                elif provider.missing(fields):
+                    to_fetch.append((rowid, fields))
+                else:
+                    run["existing"][provider.source] += 1
+                    if not fields.get(provider.field):
+                        fallback.append((rowid, fields))
+            if not to_fetch:
+                unresolved = fallback
+                continue
+            scores = self.__lookup_scores(provider, [fields for _, fields in to_fetch], run=run)
+            if provider.client.is_open:
+                # 熔断后本批未查询的行及之后的行都留在检查点中，由__fetch_scores统一记录日志
+                run["circuit_open"] = provider.name
+            stopped = run["stop"]()
+            for rowid, fields in to_fetch:
+                key = provider.key(fields)
+                if key is not None and key not in scores:
+                    if stopped:
+                        unfinished.add(rowid)
+                        continue
+                    # 其他实例中的查询未完成，下次运行再获取
+                    retry_times[rowid] = now
+                    fallback.append((rowid, fields))
+                    continue
+                score = scores.get(key)
+                title = fields.get("title")
+                if score is not None:
+                    fields[provider.field] = score
+                    changed[rowid].add(provider.field)
+                    logger.info(f"更新{provider.name}评分：{title} {score}")
+                    self.__add_summary(run["summary"], f"{title} 更新{provider.name}评分：{score}")
+                else:
+                    retry_times.setdefault(rowid, now + self._retry_interval)
+                    logger.debug(f"未找到{provider.name}评分：{title} {key}")
+                    fallback.append((rowid, fields))
+            unresolved = [item for item in fallback if item[0] not in unfinished]
+        return [(rowid, fields, changed[rowid], retry_times.get(rowid))
+                for rowid, fields in batch if rowid not in unfinished]
+
+    def __lookup_scores(self, provider: ScoreProvider, fields_list: List[Dict],
+                        run: dict) -> Dict[Optional[str], Optional[float]]:
+        """
+        按外部id去重后批量查询：同一次运行中相同id只请求一次，结果（含未找到）分发给共用该id的所有行
+        :param fields_list: 待查询行的评分字段
+        :param run: 本次运行的查询结果{"lookups": {(source, 外部id): Future}}及停止条件{"stop": Callable}
+        :return: {外部id: 评分}，无外部id的行对应None；因停止或熔断未查询的id不在结果中
+        """
+        lookups = run["lookups"]
+        keys = [provider.key(fields) for fields in fields_list]
+        scores = {None: None}
+        todo = {}
+        # 其他实例正在查询的id，等待其结果
+        pending = {}
+        with self._lookups_lock:
+            for key, fields in zip(keys, fields_list):
+                if key is None or key in todo:
+                    continue
+                future = lookups.get((provider.source, key))
+                if future is None:
+                    lookups[(provider.source, key)] = Future()
+                    todo[key] = fields
+                else:
+                    pending[key] = future
+        self.__count("lookups_deduplicated", sum(1 for key in keys if key is not None) - len(todo))
+        fetched = {}
+        try:
+            fetched = provider.lookup(todo, stop=run.get("stop"))
+        finally:
+            with self._lookups_lock:
+                for key in todo:
+                    future = lookups[(provider.source, key)]
+                    if key in fetched:
+                        future.set_result(fetched[key])
+                    else:
+                        # 未查询的id可重新查询
+                        del lookups[(provider.source, key)]
+                        future.cancel()
+        scores.update(fetched)
+        for key, future in pending.items():
+            try:
+                scores[key] = future.result()
+            except CancelledError:
+                continue
+        return scores
+
+    def refresh_stale_scores(self):
+        """
+        刷新已有的评分：按评分的陈旧程度（距上次获取的时间 / 按上映时间确定的刷新周期）排序，
+        每次运行只重新获取最陈旧的若干条，并受请求数及时间预算限制
+        只刷新当前作为score来源的评分，写回时仅在评分未被修改且确有变化时更新
+        """
+        use_douban, use_tmdb = self._use_douban_score, self._use_tmdb_score
+        if (not use_douban and not use_tmdb) or self._refresh_limit <= 0:
+            return
+        with self.__record_run("刷新过期评分"):
+            sources = self.__score_chain(use_douban, use_tmdb, self._use_imdb_score)
+            stale = self.__find_stale_scores(sources=sources, limit=self._refresh_limit)
+            logger.info(f"共 {len(stale)} 条评分待刷新")
+            deadline = time.time() + self._refresh_minutes * 60
+            job = self._jobs.current()
+            run = {
+                "lookups": {},
+                "stop": lambda: bool(job and job.cancelled) or time.time() >= deadline,
+            }
+            summary = self.__new_summary()
+            updates = {}
+            refreshed_ids = []
+            digests = []
+            cached_scores = []
+            try:
+                for index in range(0, len(stale), self._checkpoint_size):
+                    if time.time() >= deadline:
+                        logger.info(f"已达到刷新时间预算，剩余 {len(stale) - index} 条下次刷新")
+                        break
+                    self.__check_job(f"刷新过期评分：{index}/{len(stale)}", index / len(stale))
+                    batch = stale[index:index + self._checkpoint_size]
+                    skipped = 0
+                    for provider in self._providers.values():
+                        items = [(rowid, fields) for _, rowid, source, fields in batch if source == provider.source]
+                        if not items:
+                            continue
+                        scores = self.__lookup_scores(provider, [fields for _, fields in items], run=run)
+                        for rowid, fields in items:
+                            key = provider.key(fields)
+                            if key is not None and key not in scores:
+                                skipped += 1
+                                continue
+                            # 获取失败的行同样记为已刷新，避免长期占用刷新预算
+                            refreshed_ids.append(rowid)
+                            self.__count("scores_refreshed")
+                            score = scores.get(key)
+                            if not score:
+                                continue
+                            cached_scores.append((provider.source, key, score))
+                            field = provider.field
+                            if score == fields[field]:
+                                continue
+                            title = fields.get("title")
+                            logger.info(f"刷新评分：{title} {fields[field]} -> {score}")
+                            self.__add_summary(summary, f"{title} 刷新评分：{fields[field]} -> {score}")
+                            updates.setdefault(field, []).append((score, rowid, fields[field]))
+                            fields[field] = score
+                            digests.append((rowid, self.__score_digest(fields), None))
+                    if skipped:
+                        # 评分接口已熔断、任务已取消或已达到时间预算
+                        logger.error(f"评分刷新中断，剩余 {len(stale) - index - len(batch) + skipped} 条下次刷新")
+                        break
+            finally:
+                changed = 0
+                for field, params in updates.items():
+                    # 条件更新：评分仍为读取时的值才写入，不覆盖期间被修改的评分
+                    changed += self._db.write_many(
+                        f"UPDATE zvideo_collection SET meta_info = JSON_SET(meta_info, '$.{field}', ?) "
+                        f"WHERE id = ? AND JSON_VALID(meta_info) AND JSON_EXTRACT(meta_info, '$.{field}') = ?",
+                        params,
+                    )
+                self._store.save_digests(digests)
+                self._cache.save_cached_scores([score for score in cached_scores if score[1]])
+                self._store.save_refresh_times(refreshed_ids)
+                self._scan_state["refresh_at"] = time.time()
+                self.save_data(self.__data_key("scan_state"), self._scan_state)
+            logger.info(f"已刷新 {len(refreshed_ids)} 条评分，其中 {changed} 条有变化")
+            if changed:
+                applied = self.__apply_scores(use_douban=use_douban, use_tmdb=use_tmdb,
+                                              use_imdb=self._use_imdb_score)
+                logger.info(f"评分刷新完成，共更新 {applied} 条记录的score")
+            self.__post_summary(summary)
+
+    def __find_stale_scores(self, sources: List[str], limit: int) -> List[Tuple[float, int, str, Dict]]:
+        """
+        分页扫描已有评分的行，保留陈旧程度最高的limit条，内存占用与limit相关
+        :param sources: 按优先级排列的已启用评分来源
+        :return: [(陈旧程度, id, 评分来源, fields)]，按陈旧程度降序
+        """
+        now = time.time()
+        heap = []
+        with self._db.reader() as conn:
+            for rows in self._db.iter_chunks(
+                    conn,
+                    f"""
+                    SELECT id, extend_type,
+                           CASE WHEN JSON_VALID(meta_info) THEN JSON_EXTRACT(meta_info, {", ".join("?" * len(self._refresh_fields))}) END
+                    FROM zvideo_collection
+                    WHERE id > ? ORDER BY id LIMIT ?
+                    """,
+                    params=list(self._refresh_fields.values()),
+            ):
+                refresh_times = self._store.get_refresh_times(rows[0][0], rows[-1][0])
+                unseen = []
+                for rowid, extend_type, fields_json in rows:
+                    if extend_type == 7 or not fields_json:
+                        continue
+                    with self.__span("json"):
+                        fields = dict(zip(self._refresh_fields, json.loads(fields_json)))
+                    # 与__apply_scores一致：按优先级取首个有效评分的来源，离线的IMDb评分无需刷新
+                    source = next((source for source in sources if fields.get(self._score_sources[source])), None)
+                    if source not in self._providers:
+                        continue
+                    refreshed_at = refresh_times.get(rowid)
+                    if refreshed_at is None:
+                        unseen.append(rowid)
+                        continue
+                    staleness = (now - refreshed_at) / self.__refresh_period(fields.get("release_date"), now)
+                    if staleness < 1:
+                        continue
+                    item = (staleness, rowid, source, fields)
+                    if len(heap) < limit:
+                        heapq.heappush(heap, item)
+                    elif staleness > heap[0][0]:
+                        heapq.heapreplace(heap, item)
+                # 此前未记录的评分从现在开始计算陈旧程度，避免首次启用时刷新整个媒体库
+                self._store.save_refresh_times(unseen, first_seen=True)
+        return sorted(heap, reverse=True)
+
+    def __refresh_period(self, release_date: Any, now: float) -> float:
+        """
+        评分的刷新周期：上映初期评分变化快，周期接近下限；上映越久周期越长，直至上限
+        :param release_date: 上映日期，YYYY-MM-DD或YYYY，未知时使用上限
+        """
+        try:
+            text = str(release_date)[:10]
+            released = datetime.strptime(text, "%Y-%m-%d" if len(text) == 10 else "%Y").timestamp()
+        except (TypeError, ValueError):
+            return self._refresh_max_period
+        release_age_days = max(0.0, (now - released) / 86400)
+        return min(self._refresh_max_period, self._refresh_min_period * (1 + release_age_days / 30))
 
     def sync_douban_status(self):
-        self.set_douban_watching()
-        self.set_douban_done()
-        # 缓存数据
-        self.save_data("zvideoassistant", self._cached_data)
+        try:
+            with self.__record_run("同步观影状态"):
+                self.__migrate_cached_data()
+                self.set_douban_watching()
+                self.set_douban_done()
+        finally:
+            # 任务取消时同样保存已处理的进度
+            self.save_data(self.__data_key("scan_state"), self._scan_state)
+            # 运行期间ck可能已刷新
+            self.__save_douban_ck()
+
+    def __migrate_cached_data(self):
+        """
+        将旧版以标题为键保存在插件数据中的观影状态迁移到本地存储
+        """
+        if self._instance_key:
+            # 旧版数据只属于主实例
+            return
+        cached_data = self.get_data("zvideoassistant")
+        if not cached_data:
+            return
+        migrated = 0
+        try:
+            with self._db.reader() as conn:
+                for rows in self._db.iter_chunks(
+                        conn,
+                        """
+                        SELECT id, JSON_EXTRACT(meta_info, '$.title'), JSON_EXTRACT(meta_info, '$.relation.douban.douban_id')
+                        FROM zvideo_collection
+                        WHERE id > ? AND JSON_VALID(meta_info) ORDER BY id LIMIT ?
+                        """
+                ):
+                    statuses = [(douban_id, cached_data[title]) for _, title, douban_id in rows
+                                if douban_id and cached_data.get(title)]
+                    self._store.save_statuses(statuses)
+                    migrated += len(statuses)
+        except sqlite3.Error as e:
+            logger.error(f"迁移观影状态缓存失败：{e}")
+            return
+        self.del_data("zvideoassistant")
+        logger.info(f"已迁移观影状态缓存 {migrated} 条")
 
     def get_form(self) -> Tuple[List[dict], Dict[str, Any]]:
         return [
@@ -706,6 +1955,19 @@ class ZvideoAssistant(_PluginBase):
                                     }
                                 ],
                             },
+                            {
+                                "component": "VCol",
+                                "props": {"cols": 12, "md": 4},
+                                "content": [
+                                    {
+                                        "component": "VSwitch",
+                                        "props": {
+                                            "model": "use_imdb_score",
+                                            "label": "使用IMDb评分",
+                                        },
+                                    }
+                                ],
+                            },
                             {
                                 "component": "VCol",
                                 "props": {"cols": 12, "md": 4},
@@ -729,6 +1991,142 @@ class ZvideoAssistant(_PluginBase):
                                     }
                                 ],
                             },
+                            {
+                                "component": "VCol",
+                                "props": {"cols": 12, "md": 4},
+                                "content": [
+                                    {
+                                        "component": "VSwitch",
+                                        "props": {
+                                            "model": "watch_db",
+                                            "label": "数据库变化时自动运行",
+                                        },
+                                    }
+                                ],
+                            },
+                            {
+                                "component": "VCol",
+                                "props": {"cols": 12, "md": 4},
+                                "content": [
+                                    {
+                                        "component": "VSwitch",
+                                        "props": {
+                                            "model": "profile",
+                                            "label": "性能剖析",
+                                            "hint": "每次运行生成性能报告，可通过API下载",
+                                            "persistent-hint": True,
+                                        },
+                                    }
+                                ],
+                            },
+                            {
+                                "component": "VCol",
+                                "props": {"cols": 12, "md": 4},
+                                "content": [
+                                    {
+                                        "component": "VSwitch",
+                                        "props": {
+                                            "model": "collection_score",
+                                            "label": "合集评分取成员平均",
+                                            "hint": "需要合集的meta_info中包含成员列表collection_ids",
+                                            "persistent-hint": True,
+                                        },
+                                    }
+                                ],
+                            },
+                        ],
+                    },
+                    {
+                        "component": "VRow",
+                        "content": [
+                            {
+                                "component": "VCol",
+                                "props": {"cols": 12, "md": 4},
+                                "content": [
+                                    {
+                                        "component": "VSwitch",
+                                        "props": {
+                                            "model": "refresh_stale_score",
+                                            "label": "刷新过期评分",
+                                        },
+                                    }
+                                ],
+                            },
+                            {
+                                "component": "VCol",
+                                "props": {"cols": 12, "md": 4},
+                                "content": [
+                                    {
+                                        "component": "VTextField",
+                                        "props": {
+                                            "model": "refresh_limit",
+                                            "label": "每次最多刷新条数",
+                                            "type": "number",
+                                        },
+                                    }
+                                ],
+                            },
+                            {
+                                "component": "VCol",
+                                "props": {"cols": 12, "md": 4},
+                                "content": [
+                                    {
+                                        "component": "VTextField",
+                                        "props": {
+                                            "model": "refresh_minutes",
+                                            "label": "每次最多刷新时长（分钟）",
+                                            "type": "number",
+                                        },
+                                    }
+                                ],
+                            },
+                        ],
+                    },
+                    {
+                        "component": "VRow",
+                        "content": [
+                            {
+                                "component": "VCol",
+                                "props": {"cols": 12, "md": 4},
+                                "content": [
+                                    {
+                                        "component": "VTextField",
+                                        "props": {
+                                            "model": "score_priority",
+                                            "label": "评分优先级",
+                                            "placeholder": "douban,tmdb,imdb",
+                                        },
+                                    }
+                                ],
+                            },
+                            {
+                                "component": "VCol",
+                                "props": {"cols": 12, "md": 4},
+                                "content": [
+                                    {
+                                        "component": "VTextField",
+                                        "props": {
+                                            "model": "score_limit",
+                                            "label": "定时补全评分每次最多请求数（0为不限）",
+                                            "type": "number",
+                                        },
+                                    }
+                                ],
+                            },
+                            {
+                                "component": "VCol",
+                                "props": {"cols": 12, "md": 4},
+                                "content": [
+                                    {
+                                        "component": "VTextField",
+                                        "props": {
+                                            "model": "score_minutes",
+                                            "label": "定时补全评分每次最多时长（分钟，0为不限）",
+                                            "type": "number",
+                                        },
+                                    }
+                                ],
+                            },
                         ],
                     },
                     {
@@ -790,6 +2188,46 @@ class ZvideoAssistant(_PluginBase):
                             }
                         ],
                     },
+                    {
+                        "component": "VRow",
+                        "content": [
+                            {
+                                "component": "VCol",
+                                "props": {"cols": 12},
+                                "content": [
+                                    {
+                                        "component": "VTextarea",
+                                        "props": {
+                                            "model": "instances",
+                                            "label": "其他极影视实例",
+                                            "rows": 2,
+                                            "placeholder": "每行一个：数据库路径|豆瓣cookie，cookie留空则从cookiecloud获取；各实例并发处理，共用评分缓存",
+                                        },
+                                    }
+                                ],
+                            }
+                        ],
+                    },
+                    {
+                        "component": "VRow",
+                        "content": [
+                            {
+                                "component": "VCol",
+                                "props": {"cols": 12},
+                                "content": [
+                                    {
+                                        "component": "VTextarea",
+                                        "props": {
+                                            "model": "imdb_path",
+                                            "label": "IMDb数据集目录",
+                                            "rows": 1,
+                                            "placeholder": "存放title.ratings.tsv.gz（及可选的title.basics.tsv.gz）的目录，下载自https://datasets.imdbws.com",
+                                        },
+                                    }
+                                ],
+                            }
+                        ],
+                    },
                     {
                         "component": "VRow",
                         "content": [
@@ -846,7 +2284,7 @@ class ZvideoAssistant(_PluginBase):
                                         "props": {
                                             "type": "info",
                                             "variant": "tonal",
-                                            "text": "极影视默认使用tmdb或imdb评分，勾选'使用豆瓣评分'后，将使用豆瓣评分。同时勾选豆瓣及tmdb评分时，优先豆瓣，豆瓣无评分时，使用tmdb评分",
+                                            "text": "极影视默认使用tmdb或imdb评分，勾选'使用豆瓣评分'后，将使用豆瓣评分。同时勾选多个评分来源时，按'评分优先级'（默认douban,tmdb,imdb）使用首个有评分的来源，前一来源无评分时回退到下一来源，IMDb评分来自离线数据集，无需联网。开启'刷新过期评分'后，每天按评分获取时间及上映时间重新获取最陈旧的部分评分，新上映的影片刷新更频繁。开启'数据库变化时自动运行'后，极影视新增影片或播放记录变化后约1分钟内自动增量运行",
                                         },
                                     }
                                 ],
@@ -860,16 +2298,168 @@ class ZvideoAssistant(_PluginBase):
             "notify": False,
             "onlyonce": False,
             "cron": "0 0 * * *",
+            "refresh_stale_score": False,
+            "refresh_limit": 100,
+            "refresh_minutes": 10,
+            "score_limit": 0,
+            "score_minutes": 0,
+            "watch_db": False,
+            "profile": False,
+            "collection_score": False,
+            "score_priority": "douban,tmdb,imdb",
+            "instances": "",
         }
 
     def get_page(self) -> List[dict]:
-        pass
+        """
+        插件详情页：最近一次运行的指标及最近若干次运行的趋势
+        """
+        history = self.get_data("metrics") or []
+        if self._metrics:
+            history = history + [self._metrics.snapshot()]
+        if not history:
+            return [
+                {
+                    "component": "div",
+                    "text": "暂无运行记录",
+                    "props": {"class": "text-center"},
+                }
+            ]
+        latest = history[-1]
+        counters = latest.get("counters") or {}
+        hit_ratio = latest.get("cache_hit_ratio")
+        cards = [
+            ("运行", f"{latest.get('name')}{'（运行中）' if latest.get('running') else ''}"),
+            ("开始时间", datetime.fromtimestamp(latest.get("started_at")).strftime("%Y-%m-%d %H:%M:%S")),
+            ("耗时", f"{latest.get('duration', 0):.1f}s"),
+            ("扫描行数", counters.get("rows_scanned", 0)),
+            ("待处理行数", counters.get("candidates", 0)),
+            ("写入行数", counters.get("rows_written", 0)),
+            ("缓存命中率", f"{hit_ratio:.1%}" if hit_ratio is not None else "-"),
+            ("数据库/网络耗时", f"{latest.get('sql_seconds', 0):.1f}s / {latest.get('network_seconds', 0):.1f}s"),
+        ]
+        labels = [datetime.fromtimestamp(run.get("started_at")).strftime("%m-%d %H:%M") for run in history]
+        return [
+            {
+                "component": "VRow",
+                "content": [
+                    {
+                        "component": "VCol",
+                        "props": {"cols": 6, "md": 3},
+                        "content": [
+                            {
+                                "component": "VCard",
+                                "props": {"variant": "tonal"},
+                                "content": [
+                                    {
+                                        "component": "VCardText",
+                                        "content": [
+                                            {"component": "div", "props": {"class": "text-caption"}, "text": title},
+                                            {"component": "div", "props": {"class": "text-h6"}, "text": str(value)},
+                                        ],
+                                    }
+                                ],
+                            }
+                        ],
+                    } for title, value in cards
+                ],
+            },
+            {
+                "component": "VRow",
+                "content": [
+                    {
+                        "component": "VCol",
+                        "props": {"cols": 12},
+                        "content": [
+                            {
+                                "component": "VTable",
+                                "props": {"hover": True},
+                                "content": [
+                                    {
+                                        "component": "thead",
+                                        "content": [
+                                            {
+                                                "component": "tr",
+                                                "content": [
+                                                    {"component": "th", "props": {"class": "text-start ps-4"},
+                                                     "text": text}
+                                                    for text in ("接口", "调用次数", "失败次数",
+                                                                 "P50(s)", "P90(s)", "P99(s)")
+                                                ],
+                                            }
+                                        ],
+                                    },
+                                    {
+                                        "component": "tbody",
+                                        "content": [
+                                            {
+                                                "component": "tr",
+                                                "content": [
+                                                    {"component": "td", "text": str(text)}
+                                                    for text in (source, stat.get("calls"), stat.get("errors"),
+                                                                 stat.get("p50"), stat.get("p90"), stat.get("p99"))
+                                                ],
+                                            } for source, stat in (latest.get("http") or {}).items()
+                                        ],
+                                    },
+                                ],
+                            }
+                        ],
+                    }
+                ],
+            },
+            {
+                "component": "VRow",
+                "content": [
+                    {
+                        "component": "VCol",
+                        "props": {"cols": 12},
+                        "content": [
+                            {
+                                "component": "VApexChart",
+                                "props": {
+                                    "type": "line",
+                                    "height": 300,
+                                    "options": {
+                                        "chart": {"type": "line", "toolbar": {"show": False}},
+                                        "title": {"text": "运行趋势"},
+                                        "xaxis": {"categories": labels},
+                                        "yaxis": [
+                                            {"seriesName": "扫描行数", "title": {"text": "行数/次数"}},
+                                            {"seriesName": "扫描行数", "show": False},
+                                            {"seriesName": "扫描行数", "show": False},
+                                            {"opposite": True, "title": {"text": "耗时(s)"}},
+                                        ],
+                                        "stroke": {"width": 2},
+                                    },
+                                    "series": [
+                                        {"name": "扫描行数",
+                                         "data": [(run.get("counters") or {}).get("rows_scanned", 0)
+                                                  for run in history]},
+                                        {"name": "写入行数",
+                                         "data": [(run.get("counters") or {}).get("rows_written", 0)
+                                                  for run in history]},
+                                        {"name": "接口调用",
+                                         "data": [sum(stat.get("calls", 0) for stat in (run.get("http") or {}).values())
+                                                  for run in history]},
+                                        {"name": "耗时",
+                                         "data": [run.get("duration", 0) for run in history]},
+                                    ],
+                                },
+                            }
+                        ],
+                    }
+                ],
+            },
+        ]
 
     def stop_service(self):
         """
         退出插件
         """
         try:
+            if self._jobs:
+                self._jobs.stop()
             if self._scheduler:
                 self._scheduler.remove_all_jobs()
                 if self._scheduler.running: